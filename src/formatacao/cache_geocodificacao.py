@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+from src.formatacao.localizacao import normalizar
+from src.utils.utils import pega_caminho_base
+
+CAMINHO_CACHE_GEOCODIFICACAO = os.path.join('dados', 'cache', 'geocodificacao.sqlite')
+
+STATUS_ENCONTRADO = 'encontrado'
+STATUS_NAO_ENCONTRADO = 'nao_encontrado'
+
+# Resultados negativos expiram para que endereços corrigidos ou recém-indexados sejam consultados de novo
+VALIDADE_NEGATIVOS = timedelta(days=30)
+
+# Intervalo mínimo entre consultas à API, em segundos (política de uso do Nominatim)
+INTERVALO_CONSULTAS = 1
+
+
+class CacheGeocodificacao:
+    def __init__(self, caminho=CAMINHO_CACHE_GEOCODIFICACAO, validade_negativos=VALIDADE_NEGATIVOS):
+        """
+        Cache persistente de geocodificação em SQLite: endereço normalizado -> latitude, longitude
+        e status, com a data da consulta. Resultados positivos não expiram; negativos expiram após
+        `validade_negativos`. Erros de comunicação não são gravados.
+
+        :param caminho: Caminho do banco SQLite, relativo à raiz do projeto (ou absoluto).
+        :param validade_negativos: timedelta após o qual um endereço não encontrado é consultado de novo.
+        """
+        self.caminho = os.path.join(pega_caminho_base(), caminho)
+        self.validade_negativos = validade_negativos
+        self.consultas = 0
+        self.acertos = 0
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        # O geocodificador assíncrono pode usar o cache a partir de outra thread, sempre de forma serializada
+        self.conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        self.conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geocodificacao (
+                endereco TEXT PRIMARY KEY,
+                latitude REAL,
+                longitude REAL,
+                status TEXT NOT NULL,
+                atualizado_em TEXT NOT NULL
+            )
+            """
+        )
+        self.conexao.commit()
+
+    @staticmethod
+    def normalizar_endereco(endereco):
+        return normalizar(endereco)
+
+    def obter(self, endereco):
+        """
+        Consulta o cache.
+        :param endereco: Endereço a ser consultado.
+        :return: Tupla (latitude, longitude, status) ou None, se o endereço não estiver no cache ou
+                 se o resultado negativo já tiver expirado.
+        """
+        linha = self.conexao.execute(
+            "SELECT latitude, longitude, status, atualizado_em FROM geocodificacao WHERE endereco = ?",
+            (self.normalizar_endereco(endereco),)
+        ).fetchone()
+        if linha is None:
+            return None
+        latitude, longitude, status, atualizado_em = linha
+        if status != STATUS_ENCONTRADO and datetime.now() - datetime.fromisoformat(atualizado_em) > self.validade_negativos:
+            return None
+        return latitude, longitude, status
+
+    def gravar(self, endereco, latitude, longitude, status):
+        """
+        Grava (ou substitui) o resultado da geocodificação de um endereço.
+        """
+        self.gravar_varios([(endereco, latitude, longitude, status)])
+
+    def gravar_varios(self, registros):
+        """
+        Grava vários resultados em uma única transação, que é confirmada de forma atômica.
+        :param registros: Lista de tuplas (endereço, latitude, longitude, status).
+        """
+        atualizado_em = datetime.now().isoformat(timespec='seconds')
+        with self.conexao:
+            self.conexao.executemany(
+                "INSERT OR REPLACE INTO geocodificacao (endereco, latitude, longitude, status, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(self.normalizar_endereco(endereco), latitude, longitude, status, atualizado_em)
+                 for endereco, latitude, longitude, status in registros]
+            )
+
+    def geocodificar(self, endereco, geolocator):
+        """
+        Retorna as coordenadas do endereço, consultando o geolocator apenas se o cache não tiver
+        um resultado válido.
+        :param endereco: Endereço a ser geocodificado.
+        :param geolocator: Objeto geolocator.
+        :return: Tupla (latitude, longitude) ou None, se o endereço não foi encontrado.
+        """
+        resultado = self.obter(endereco)
+        if resultado is not None:
+            self.acertos += 1
+        else:
+            try:
+                time.sleep(INTERVALO_CONSULTAS)  # Evita sobrecarga na API
+                self.consultas += 1
+                local = geolocator.geocode(endereco)
+            except (GeocoderTimedOut, GeocoderServiceError) as e:
+                print(f"Erro ao geolocalizar {endereco}: {e}")
+                return None
+            if local:
+                resultado = (local.latitude, local.longitude, STATUS_ENCONTRADO)
+            else:
+                resultado = (None, None, STATUS_NAO_ENCONTRADO)
+            self.gravar(endereco, *resultado)
+
+        latitude, longitude, status = resultado
+        return (latitude, longitude) if status == STATUS_ENCONTRADO else None
+
+    def fechar(self):
+        self.conexao.close()
@@ -0,0 +1,170 @@
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from colorama import Fore, Style
+
+from src.formatacao.localizacao import normalizar, mapear_valores_unicos, classificador_zonas
+from src.formatacao.zonas_geograficas import centroides_municipios, correcoes_bairros_poligonos
+from src.utils.utils import pega_caminho_base, compilar_correcoes
+
+CAMINHO_LIMITES_BAIRROS = os.path.join('dados', 'Limite_de_Bairros.geojson')
+
+# Projeção métrica (SIRGAS 2000 / UTM 23S) usada para calcular os centroides dos polígonos
+CRS_METRICO = 'EPSG:31983'
+CRS_GEOGRAFICO = 'EPSG:4326'
+
+CIDADE_RIO = 'rio de janeiro'
+NIVEIS_GAZETTEER = ('bairros', 'municipios')
+RAIO_TERRA_KM = 6371.0088
+
+_centroides = None
+_limites_bairros = {}
+
+
+def carregar_limites_bairros(caminho=CAMINHO_LIMITES_BAIRROS):
+    """
+    Lê (uma única vez por processo) os polígonos dos bairros da cidade do Rio de Janeiro.
+    :param caminho: Caminho do GeoJSON de limites de bairros, relativo à raiz do projeto.
+    :return: GeoDataFrame em EPSG:4326, com a coluna NOME_NORMALIZADO, ou None se o arquivo não existir.
+    """
+    caminho_completo = os.path.join(pega_caminho_base(), caminho)
+    if caminho_completo not in _limites_bairros:
+        if not os.path.exists(caminho_completo):
+            print(Fore.YELLOW + f"Limites de bairros não encontrados: {caminho_completo}" + Style.RESET_ALL)
+            _limites_bairros[caminho_completo] = None
+        else:
+            bairros = gpd.read_file(caminho_completo)
+            bairros = bairros.set_crs(CRS_GEOGRAFICO) if bairros.crs is None else bairros.to_crs(CRS_GEOGRAFICO)
+            bairros = bairros[bairros['nome'].apply(lambda nome: isinstance(nome, str))].reset_index(drop=True)
+            bairros['NOME_NORMALIZADO'] = bairros['nome'].apply(normalizar)
+            _limites_bairros[caminho_completo] = bairros
+    return _limites_bairros[caminho_completo]
+
+
+def carregar_centroides_bairros(caminho=CAMINHO_LIMITES_BAIRROS):
+    """
+    Calcula o centroide de cada bairro da cidade do Rio de Janeiro a partir dos limites oficiais.
+    :param caminho: Caminho do GeoJSON de limites de bairros, relativo à raiz do projeto.
+    :return: Dicionário nome normalizado -> (latitude, longitude). Vazio se o arquivo não existir.
+    """
+    bairros = carregar_limites_bairros(caminho)
+    if bairros is None:
+        return {}
+
+    centroides = bairros.to_crs(CRS_METRICO).centroid.to_crs(CRS_GEOGRAFICO)
+    return {nome: (ponto.y, ponto.x) for nome, ponto in zip(bairros['NOME_NORMALIZADO'], centroides)}
+
+
+def carregar_centroides(caminho=CAMINHO_LIMITES_BAIRROS):
+    """
+    Monta (uma única vez por processo) o gazetteer offline: centroides dos bairros do Rio e das
+    sedes dos municípios de `centroides_municipios`.
+    :return: Dicionário com as chaves 'bairros' e 'municipios', cada uma nome normalizado -> (latitude, longitude).
+    """
+    global _centroides
+    if _centroides is None:
+        _centroides = {
+            'bairros': carregar_centroides_bairros(caminho),
+            'municipios': {normalizar(nome): coordenadas for nome, coordenadas in centroides_municipios.items()},
+        }
+    return _centroides
+
+
+def localizar_offline(df, centroides=None, coluna_bairro='BAIRRO', coluna_cidade='CIDADE', niveis=NIVEIS_GAZETTEER):
+    """
+    Localiza cada linha pelo gazetteer offline: bairros da capital pelo centroide do bairro e
+    demais cidades pelo centroide do município. A busca é feita uma vez por valor distinto.
+    :param df: DataFrame com as colunas de bairro e cidade.
+    :param centroides: Gazetteer (padrão: carregar_centroides()).
+    :param niveis: Níveis do gazetteer consultados ('bairros' e/ou 'municipios').
+    :return: DataFrame com as colunas LATITUDE e LONGITUDE (NaN onde não houve correspondência).
+    """
+    centroides = carregar_centroides() if centroides is None else centroides
+    bairros = centroides['bairros'] if 'bairros' in niveis else {}
+    municipios = centroides['municipios'] if 'municipios' in niveis else {}
+
+    cidades = mapear_valores_unicos(df[coluna_cidade], normalizar)
+    ponto_bairro = mapear_valores_unicos(df[coluna_bairro], lambda bairro: bairros.get(normalizar(bairro)))
+    ponto_cidade = mapear_valores_unicos(df[coluna_cidade], lambda cidade: municipios.get(normalizar(cidade)))
+
+    pontos = np.where(cidades == CIDADE_RIO, ponto_bairro, ponto_cidade)
+    coordenadas = np.array([ponto if ponto is not None else (np.nan, np.nan) for ponto in pontos],
+                           dtype=float).reshape(-1, 2)
+    return pd.DataFrame(coordenadas, index=df.index, columns=['LATITUDE', 'LONGITUDE'])
+
+
+def distancia_haversine(latitude, longitude, latitude_ref, longitude_ref):
+    """
+    Distância em quilômetros pela fórmula de haversine, calculada de forma vetorizada.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(valor, dtype=float))
+                              for valor in (latitude, longitude, latitude_ref, longitude_ref))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(a))
+
+
+def matriz_distancias(latitude, longitude, referencias):
+    """
+    Calcula, em uma única operação vetorizada, a distância de cada ponto a cada referência.
+    :param latitude: Latitudes dos pontos (n).
+    :param longitude: Longitudes dos pontos (n).
+    :param referencias: Lista de tuplas (latitude, longitude) das referências (k).
+    :return: Matriz n x k de distâncias em quilômetros (NaN para pontos sem coordenadas).
+    """
+    referencias = np.asarray(referencias, dtype=float).reshape(-1, 2)
+    return distancia_haversine(np.asarray(latitude, dtype=float)[:, None], np.asarray(longitude, dtype=float)[:, None],
+                               referencias[:, 0], referencias[:, 1])
+
+
+def atribuir_bairros_por_coordenadas(dataframe, caminho=CAMINHO_LIMITES_BAIRROS, centroides=None):
+    """
+    Define BAIRRO e ZONA pela posição do aluno: cada ponto (LATITUDE, LONGITUDE) é atribuído ao
+    polígono de bairro que o contém, consultando o índice espacial (STR-tree) dos limites de
+    uma só vez para todos os pontos. Os nomes dos polígonos são levados ao vocabulário das zonas
+    (correcoes_bairros_poligonos). Linhas sem coordenadas, fora da cidade, cujas coordenadas são
+    apenas o centroide do próprio nome digitado ou cujo polígono não tem zona conhecida mantêm a
+    classificação textual.
+    :param dataframe: DataFrame com as colunas BAIRRO, CIDADE, ZONA, LATITUDE e LONGITUDE.
+    :param caminho: Caminho do GeoJSON de limites de bairros, relativo à raiz do projeto.
+    :param centroides: Gazetteer offline (padrão: carregar_centroides()).
+    :return: DataFrame com BAIRRO, CIDADE e ZONA atualizados e a coluna ORIGEM_BAIRRO ('poligono' ou 'texto').
+    """
+    dataframe['ORIGEM_BAIRRO'] = 'texto'
+    bairros = carregar_limites_bairros(caminho)
+    if bairros is None or dataframe.empty:
+        return dataframe
+
+    # Coordenadas que vieram do centroide do nome digitado não acrescentam informação espacial
+    centroides = carregar_centroides() if centroides is None else centroides
+    pontos_de_nome = set(centroides['bairros'].values()) | set(centroides['municipios'].values())
+    coordenadas = list(zip(dataframe['LATITUDE'], dataframe['LONGITUDE']))
+    candidatos = (dataframe['LATITUDE'].notna() & dataframe['LONGITUDE'].notna()).to_numpy() & \
+        np.array([ponto not in pontos_de_nome for ponto in coordenadas], dtype=bool)
+    if not candidatos.any():
+        return dataframe
+
+    pontos = gpd.points_from_xy(dataframe.loc[candidatos, 'LONGITUDE'], dataframe.loc[candidatos, 'LATITUDE'],
+                                crs=CRS_GEOGRAFICO)
+    indices_pontos, indices_bairros = bairros.sindex.query(pontos, predicate='within')
+    # Um ponto na divisa de dois bairros fica com o primeiro encontrado
+    indices_pontos, primeiros = np.unique(indices_pontos, return_index=True)
+    if len(indices_pontos) == 0:
+        return dataframe
+
+    correcoes = compilar_correcoes(correcoes_bairros_poligonos)
+    nomes_poligonos = bairros['NOME_NORMALIZADO'].to_numpy()[indices_bairros[primeiros]]
+    nomes = np.array([correcoes.get(nome, nome) for nome in nomes_poligonos], dtype=object)
+    zonas = np.array([classificador_zonas.zona_do_bairro(nome) for nome in nomes], dtype=object)
+
+    # Um polígono sem zona conhecida daria ZONA='Outros', pior que a classificação textual
+    conhecidos = pd.notna(zonas)
+    linhas = dataframe.index[candidatos][indices_pontos[conhecidos]]
+    if len(linhas) == 0:
+        return dataframe
+    dataframe.loc[linhas, 'BAIRRO'] = nomes[conhecidos]
+    dataframe.loc[linhas, 'CIDADE'] = CIDADE_RIO
+    dataframe.loc[linhas, 'ZONA'] = zonas[conhecidos]
+    dataframe.loc[linhas, 'ORIGEM_BAIRRO'] = 'poligono'
+    print(Fore.GREEN + f"Bairro definido pelas coordenadas para {len(linhas)} de {len(dataframe)} registros." + Style.RESET_ALL)
+    return dataframe
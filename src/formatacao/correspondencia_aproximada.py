@@ -0,0 +1,180 @@
+import os
+from collections import Counter
+import numpy as np
+import pandas as pd
+from colorama import Fore, Style
+
+from src.formatacao.localizacao import ZONAS_BAIRROS, normalizar
+from src.formatacao.zonas_geograficas import correcoes_bairros
+from src.utils.utils import pega_caminho_base
+
+CAMINHO_CORRECOES_APROXIMADAS = os.path.join('dados', 'processado', 'correcoes_aproximadas.csv')
+
+# Similaridade mínima (1 - distância de edição / tamanho do maior nome) para aceitar uma correspondência
+LIMIAR_SIMILARIDADE = 0.8
+# Fração mínima de trigramas em comum para que um nome do vocabulário seja considerado candidato
+LIMIAR_TRIGRAMAS = 0.4
+# Nomes muito curtos têm poucos trigramas e geram correspondências falsas
+TAMANHO_MINIMO = 5
+
+VALORES_IGNORADOS = {'desconhecido'}
+
+
+def trigramas(texto):
+    """
+    Retorna o conjunto de trigramas do texto, com espaços nas pontas para valorizar o início e o fim.
+    """
+    texto = f'  {texto} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def distancia_edicao(a, b):
+    """
+    Calcula a distância de Levenshtein entre dois textos.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    anterior = list(range(len(b) + 1))
+    for i, caractere_a in enumerate(a, 1):
+        atual = [i]
+        for j, caractere_b in enumerate(b, 1):
+            atual.append(min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (caractere_a != caractere_b)))
+        anterior = atual
+    return anterior[-1]
+
+
+def similaridade(a, b):
+    """
+    Similaridade entre 0 e 1 baseada na distância de edição.
+    """
+    return 1 - distancia_edicao(a, b) / max(len(a), len(b), 1)
+
+
+def vocabulario_bairros():
+    """
+    Monta o vocabulário canônico de bairros: os nomes das listas de zonas e os valores corretos
+    de `correcoes_bairros`, todos normalizados.
+    """
+    nomes = [nome for _, bairros in ZONAS_BAIRROS for nome in bairros] + list(correcoes_bairros)
+    return sorted({normalizar(nome) for nome in nomes})
+
+
+class IndiceTrigramas:
+    def __init__(self, vocabulario, limiar=LIMIAR_SIMILARIDADE, limiar_trigramas=LIMIAR_TRIGRAMAS):
+        """
+        Índice invertido trigrama -> nomes do vocabulário, usado para buscar o nome canônico mais
+        parecido com um valor desconhecido. Os trigramas selecionam poucos candidatos e a distância
+        de edição decide entre eles.
+
+        :param vocabulario: Lista de nomes canônicos (já normalizados).
+        :param limiar: Similaridade mínima para aceitar uma correspondência.
+        :param limiar_trigramas: Fração mínima de trigramas em comum para um nome ser candidato.
+        """
+        self.vocabulario = list(dict.fromkeys(vocabulario))
+        self.conhecidos = set(self.vocabulario)
+        self.limiar = limiar
+        self.limiar_trigramas = limiar_trigramas
+        self._tamanhos = []
+        self._indice = {}
+        for posicao, nome in enumerate(self.vocabulario):
+            grupo = trigramas(nome)
+            self._tamanhos.append(len(grupo))
+            for trigrama in grupo:
+                self._indice.setdefault(trigrama, []).append(posicao)
+
+    def buscar(self, valor):
+        """
+        Busca o nome canônico mais parecido com o valor.
+        :param valor: Valor a ser buscado (já normalizado).
+        :return: Tupla (nome canônico, similaridade) ou None, se nenhum nome atingir o limiar.
+        """
+        if valor in self.conhecidos:
+            return valor, 1.0
+
+        grupo = trigramas(valor)
+        comuns = Counter(posicao for trigrama in grupo for posicao in self._indice.get(trigrama, ()))
+
+        melhor = None
+        for posicao, quantidade in comuns.items():
+            if 2 * quantidade / (len(grupo) + self._tamanhos[posicao]) < self.limiar_trigramas:
+                continue
+            nome = self.vocabulario[posicao]
+            pontuacao = similaridade(valor, nome)
+            if pontuacao >= self.limiar and (melhor is None or pontuacao > melhor[1]):
+                melhor = nome, pontuacao
+        return melhor
+
+
+def carregar_correcoes_aproximadas(caminho=CAMINHO_CORRECOES_APROXIMADAS):
+    """
+    Carrega as correspondências aceitas em execuções anteriores.
+    :return: Dicionário variante -> nome canônico.
+    """
+    caminho_completo = os.path.join(pega_caminho_base(), caminho)
+    if not os.path.exists(caminho_completo):
+        return {}
+    correcoes = pd.read_csv(caminho_completo, keep_default_na=False)
+    return dict(zip(correcoes['VARIANTE'], correcoes['CORRETO']))
+
+
+def salvar_correcoes_aproximadas(novas, caminho=CAMINHO_CORRECOES_APROXIMADAS):
+    """
+    Acrescenta novas correspondências aceitas ao arquivo de correções aproximadas.
+    :param novas: Lista de tuplas (variante, nome canônico, similaridade).
+    """
+    caminho_completo = os.path.join(pega_caminho_base(), caminho)
+    os.makedirs(os.path.dirname(caminho_completo), exist_ok=True)
+    novas = pd.DataFrame(novas, columns=['VARIANTE', 'CORRETO', 'SIMILARIDADE'])
+    if os.path.exists(caminho_completo):
+        novas = pd.concat([pd.read_csv(caminho_completo, keep_default_na=False), novas], ignore_index=True)
+    novas.drop_duplicates('VARIANTE', keep='first').to_csv(caminho_completo, index=False)
+
+
+def corrigir_bairros_aproximados(df, coluna='BAIRRO', indice=None, caminho=CAMINHO_CORRECOES_APROXIMADAS):
+    """
+    Corrige grafias desconhecidas de bairros pelo nome canônico mais parecido.
+    As correspondências já aceitas são lidas do arquivo de correções aproximadas; as novas são
+    buscadas no índice de trigramas uma vez por valor distinto e gravadas no mesmo arquivo, onde
+    podem ser revisadas e promovidas para `correcoes_bairros`.
+    :param df: DataFrame com a coluna de bairros já normalizada.
+    :param coluna: Coluna de bairros.
+    :param indice: IndiceTrigramas a ser usado (padrão: vocabulário de bairros do projeto).
+    :param caminho: Arquivo das correções aproximadas, relativo à raiz do projeto.
+    :return: DataFrame corrigido.
+    """
+    indice = indice or indice_bairros
+    aceitas = carregar_correcoes_aproximadas(caminho)
+    novas = []
+
+    codigos, unicos = pd.factorize(df[coluna], use_na_sentinel=False)
+    corrigidos = []
+    for valor in unicos:
+        if not isinstance(valor, str):
+            corrigidos.append(valor)
+            continue
+        chave = normalizar(valor)
+        if chave in indice.conhecidos or chave in VALORES_IGNORADOS or len(chave) < TAMANHO_MINIMO:
+            corrigidos.append(valor)
+        elif chave in aceitas:
+            corrigidos.append(aceitas[chave])
+        else:
+            resultado = indice.buscar(chave)
+            if resultado is None:
+                corrigidos.append(valor)
+            else:
+                aceitas[chave] = resultado[0]
+                novas.append((chave, resultado[0], round(resultado[1], 3)))
+                corrigidos.append(resultado[0])
+
+    corrigidos = np.array(corrigidos, dtype=object)
+    df[coluna] = pd.Series(corrigidos[codigos], index=df.index, dtype=object)
+
+    if novas:
+        salvar_correcoes_aproximadas(novas, caminho)
+        print(Fore.YELLOW + f"Novas correções aproximadas em {coluna}: " +
+              ', '.join(f"{variante} -> {correto}" for variante, correto, _ in novas) + Style.RESET_ALL)
+    return df
+
+
+# Índice único, montado na importação do módulo
+indice_bairros = IndiceTrigramas(vocabulario_bairros())
@@ -2,37 +2,70 @@ import pandas as pd
 import numpy as np
 from geopy import Nominatim
 from geopy.distance import geodesic
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-import time
 import os
 from colorama import Fore, Style
 
+from src.formatacao.cache_geocodificacao import CacheGeocodificacao
+from src.formatacao.geocodificacao_assincrona import GeocodificadorAssincrono
+from src.formatacao.centroides import carregar_centroides, localizar_offline, distancia_haversine, matriz_distancias, \
+    CIDADE_RIO
+from src.formatacao.localizacao import normalizar
 from src.utils.utils import carregar_dados, salvar_dados
 
+ENDERECO_URCA = "Urca, Rio de Janeiro, Rio de Janeiro"
+ESTADO_RIO = 'Rio de Janeiro'
+COLUNAS_ENDERECO = ['BAIRRO', 'CIDADE', 'ESTADO']
+# Coordenadas da Urca, usadas quando o ponto não está no gazetteer nem pode ser geocodificado
+COORDENADAS_URCA = (-22.9497, -43.1640)
 
-def inicializar_geolocator():
+# Pontos de referência (latitude, longitude aproximadas) para as colunas DISTANCIA_<NOME>
+PONTOS_REFERENCIA = {
+    'URCA': COORDENADAS_URCA,
+    'HOSPITAL_GAFFREE': (-22.9146, -43.2176),  # Hospital Universitário Gaffrée e Guinle, Tijuca
+    'CENTRAL_DO_BRASIL': (-22.9035, -43.1910),
+    'RODOVIARIA_NOVO_RIO': (-22.8988, -43.2094),
+    'TERMINAL_ALVORADA': (-23.0005, -43.3659),
+}
+
+
+def inicializar_geolocator(dominio='nominatim.openstreetmap.org', esquema='https'):
     """
     Inicializa o objeto geolocator.
+    :param dominio: Domínio do serviço Nominatim (permite apontar para um servidor local).
+    :param esquema: Esquema da URL ('https' ou 'http').
     :return: Objeto geolocator
     """
-    return Nominatim(user_agent="geolocalizacao_urca")
+    return Nominatim(user_agent="geolocalizacao_urca", domain=dominio, scheme=esquema)
+
+
+def chaves_endereco(dataframe):
+    """
+    Chave de cada endereço: tupla (BAIRRO, CIDADE, ESTADO), com a cidade normalizada.
+    Arquivos antigos, só com a coluna BAIRRO, foram gerados para a capital e valem apenas para ela.
+    :param dataframe: DataFrame com a coluna BAIRRO e, opcionalmente, CIDADE e ESTADO.
+    :return: Lista de tuplas.
+    """
+    if 'CIDADE' not in dataframe.columns:
+        return [(bairro, CIDADE_RIO, ESTADO_RIO) for bairro in dataframe['BAIRRO']]
+    cidades = dataframe['CIDADE'].map(lambda cidade: normalizar(cidade) if isinstance(cidade, str) else cidade)
+    return list(zip(dataframe['BAIRRO'], cidades, dataframe['ESTADO']))
 
 
 def carregar_bairros_falha(filepath=r'R:\Dev\dashboard-bsi\dados\processado\bairros_falha.csv'):
     """
     Carrega a lista de bairros que falharam em calcular a distância anteriormente.
     :param filepath: Caminho do arquivo CSV de bairros falhos.
-    :return: Set com os bairros que falharam anteriormente.
+    :return: Set com as chaves (BAIRRO, CIDADE, ESTADO) que falharam anteriormente.
     """
     if os.path.exists(filepath):
-        return set(pd.read_csv(filepath)['BAIRRO'].values)
+        return set(chaves_endereco(pd.read_csv(filepath)))
     return set()
 
 
 def salvar_bairros_falha(bairros_falha, filepath='dados/processado/bairros_falha.csv'):
     """
     Salva a lista de bairros que falharam em calcular a distância.
-    :param bairros_falha: Conjunto de bairros que falharam.
+    :param bairros_falha: Conjunto de chaves (BAIRRO, CIDADE, ESTADO) que falharam.
     :param filepath: Caminho onde salvar o arquivo.
     """
     # Verifica e cria o diretório, se necessário
@@ -41,10 +74,31 @@ def salvar_bairros_falha(bairros_falha, filepath='dados/processado/bairros_falha
         os.makedirs(directory)
 
     # Salva o arquivo CSV
-    pd.DataFrame({'BAIRRO': list(bairros_falha)}).to_csv(filepath, index=False)
+    pd.DataFrame(list(bairros_falha), columns=COLUNAS_ENDERECO).to_csv(filepath, index=False)
 
 
-def calcular_distancia_ate_urca(bairro, cidade, estado, geolocator):
+def resolver_referencia_urca(geolocator, cache, centroides=None):
+    """
+    Resolve as coordenadas da Urca uma única vez: pelo gazetteer offline, pelo cache de
+    geocodificação (consultando o geolocator só na primeira vez) ou, em último caso, por
+    coordenadas fixas.
+    :return: Tupla (latitude, longitude).
+    """
+    centroides = carregar_centroides() if centroides is None else centroides
+    if 'urca' in centroides['bairros']:
+        return centroides['bairros']['urca']
+    return cache.geocodificar(ENDERECO_URCA, geolocator) or COORDENADAS_URCA
+
+
+def localizar_bairro(bairro, cidade, estado, geolocator, cache):
+    """
+    Geocodifica um bairro usando o cache persistente.
+    :return: Tupla (latitude, longitude) ou None.
+    """
+    return cache.geocodificar(f"{bairro}, {cidade}, {estado}", geolocator)
+
+
+def calcular_distancia_ate_urca(bairro, cidade, estado, geolocator, referencia=None, cache=None):
     """
     Calcula a distância entre um bairro e a Urca, no Rio de Janeiro.
     Retorna a distância em quilômetros.
@@ -52,80 +106,182 @@ def calcular_distancia_ate_urca(bairro, cidade, estado, geolocator):
     :param cidade: Nome da cidade
     :param estado: Nome do estado
     :param geolocator: Objeto geolocator
+    :param referencia: Coordenadas da Urca já resolvidas (opcional)
+    :param cache: CacheGeocodificacao a ser usado (opcional)
     :return: float
     """
-    try:
-        time.sleep(1)  # Evita sobrecarga na API
-        endereco_bairro = f"{bairro}, {cidade}, {estado}"
-        local_urca = geolocator.geocode("Urca, Rio de Janeiro, Rio de Janeiro")
-        local_bairro = geolocator.geocode(endereco_bairro)
-        if local_urca and local_bairro:
-            print(f"Calculando distância entre Urca e {bairro}...")
-            return round(geodesic((local_urca.latitude, local_urca.longitude),
-                                  (local_bairro.latitude, local_bairro.longitude)).km, 2)
-    except (GeocoderTimedOut, GeocoderServiceError) as e:
-        print(f"Erro ao geolocalizar {bairro}: {e}")
-    return np.NaN
+    cache = CacheGeocodificacao() if cache is None else cache
+    referencia = resolver_referencia_urca(geolocator, cache) if referencia is None else referencia
+    ponto = localizar_bairro(bairro, cidade, estado, geolocator, cache)
+    if ponto:
+        print(f"Calculando distância entre Urca e {bairro}...")
+        return round(geodesic(referencia, ponto).km, 2)
+    return np.nan
 
 
-def adicionar_distancia_ate_urca(dataframe, dataframe_distancias, geolocator, bairros_falha_existentes):
+def adicionar_distancia_ate_urca(dataframe, dataframe_distancias, geolocator, bairros_falha_existentes, centroides=None,
+                                 cache=None, geocodificador=None, retornar_estatisticas=False, referencia=None):
     """
     Adiciona a distância entre um bairro e a Urca ao DataFrame.
     Filtra cidades e bairros fora do estado do Rio de Janeiro.
+    A distância é resolvida uma vez por endereço distinto (BAIRRO, CIDADE, ESTADO), na ordem:
+    centroide do bairro no gazetteer offline (capital), bairros que já falharam e geocodificação
+    concorrente, que consulta primeiro o cache e só depois o geolocator. Endereços que continuarem
+    sem coordenadas usam a distância legada do dfDistancias registrada para o mesmo endereço (na
+    mesma cidade) e, por fim, o centroide do município, bem menos preciso. O resultado é distribuído para as linhas com um único join. A Urca é resolvida uma
+    única vez por execução. Distâncias e falhas são guardadas pelo endereço completo, para que um
+    bairro homônimo em outra cidade não herde o resultado; os arquivos antigos, só com a coluna
+    BAIRRO, valem apenas para a capital. Só os endereços que o geolocator não encontrou entram nos bairros falhos;
+    os que esgotaram as tentativas por erros transitórios ficam pendentes (mesmo que recebam uma
+    distância provisória das alternativas) e são consultados de novo na próxima execução. A origem
+    da distância de cada linha fica na coluna ORIGEM_DISTANCIA.
     Retorna o DataFrame atualizado, um novo DataFrame de distâncias e bairros com erro.
     :param dataframe: DataFrame com os dados
-    :param dataframe_distancias: DataFrame com as distâncias já calculadas
+    :param dataframe_distancias: DataFrame com as distâncias já calculadas, por BAIRRO, CIDADE e ESTADO
     :param geolocator: Objeto geolocator
-    :param bairros_falha_existentes: Conjunto de bairros que falharam anteriormente
-    :return: DataFrame, DataFrame, Conjunto de bairros falhos atualizado
+    :param bairros_falha_existentes: Conjunto de chaves (BAIRRO, CIDADE, ESTADO) que falharam anteriormente
+    :param centroides: Gazetteer offline (padrão: carregar_centroides())
+    :param cache: CacheGeocodificacao (padrão: cache em dados/cache/geocodificacao.sqlite)
+    :param geocodificador: GeocodificadorAssincrono (padrão: 1 requisição por segundo sobre o geolocator)
+    :param retornar_estatisticas: Se True, retorna também as estatísticas por endereço distinto.
+    :param referencia: Coordenadas da Urca já resolvidas (padrão: resolver_referencia_urca()).
+    :return: DataFrame, DataFrame, Conjunto de bairros falhos atualizado e, com retornar_estatisticas=True,
+             um DataFrame por endereço com as colunas BAIRRO, CIDADE, ESTADO, LATITUDE, LONGITUDE,
+             DISTANCIA_URCA, ORIGEM e REGISTROS
     """
     # Filtrar somente cidades e bairros dentro do estado do RJ
-    dataframe = dataframe[dataframe['ESTADO'] == 'Rio de Janeiro']
-
-    cache_distancias = dataframe_distancias.set_index('BAIRRO')[
-        'DISTANCIA_URCA'].to_dict() if not dataframe_distancias.empty else {}
+    dataframe = dataframe[dataframe['ESTADO'] == ESTADO_RIO].copy()
 
-    if 'DISTANCIA_URCA' not in dataframe.columns:
-        dataframe['DISTANCIA_URCA'] = np.NaN
+    cache_distancias = dict(zip(chaves_endereco(dataframe_distancias), dataframe_distancias['DISTANCIA_URCA'])) \
+        if not dataframe_distancias.empty else {}
 
-    bairros_sucesso = []
-    bairros_falha = bairros_falha_existentes.copy()  # Copiamos os bairros falhos existentes
-    bairros_falha_atual = set()  # Para armazenar falhas na execução atual
+    centroides = carregar_centroides() if centroides is None else centroides
+    cache = CacheGeocodificacao() if cache is None else cache
+    latitude_urca, longitude_urca = resolver_referencia_urca(geolocator, cache, centroides) if referencia is None \
+        else referencia
 
-    for index, row in dataframe.iterrows():
-        bairro = row['BAIRRO']
-        if bairro.lower() == 'urca':
-            dataframe.at[index, 'DISTANCIA_URCA'] = 0.0
-            bairros_sucesso.append(bairro)
-            continue
+    # Um registro por endereço distinto, com a quantidade de linhas de cada um
+    colunas_chave = COLUNAS_ENDERECO
+    chaves = dataframe.groupby(colunas_chave, sort=False, dropna=False).size().rename('REGISTROS').reset_index()
+    chaves['CHAVE'] = chaves_endereco(chaves)
+    chaves['ORIGEM'] = None
 
-        # Verifica se o bairro já falhou anteriormente
-        if bairro in bairros_falha:
-            dataframe.at[index, 'DISTANCIA_URCA'] = np.NaN
-            continue
+    # Centroides dos bairros da capital no gazetteer offline, com a distância calculada de forma vetorizada
+    coordenadas = localizar_offline(chaves, centroides, niveis=('bairros',))
+    chaves['LATITUDE'] = coordenadas['LATITUDE']
+    chaves['LONGITUDE'] = coordenadas['LONGITUDE']
+    chaves['DISTANCIA_URCA'] = np.round(
+        distancia_haversine(chaves['LATITUDE'], chaves['LONGITUDE'], latitude_urca, longitude_urca), 2)
+    chaves.loc[chaves['DISTANCIA_URCA'].notna(), 'ORIGEM'] = 'gazetteer'
 
-        if bairro not in cache_distancias or pd.isna(cache_distancias[bairro]) or cache_distancias[bairro] <= 0:
-            distancia = calcular_distancia_ate_urca(bairro, row['CIDADE'], row['ESTADO'], geolocator)
-            cache_distancias[bairro] = distancia
+    pendentes = chaves['ORIGEM'].isna()
+    urca = pendentes & (chaves['BAIRRO'].str.lower() == 'urca')
+    chaves.loc[urca, ['DISTANCIA_URCA', 'ORIGEM']] = [0.0, 'urca']
 
-        dataframe.at[index, 'DISTANCIA_URCA'] = cache_distancias[bairro]
+    # Bairros que já falharam anteriormente não são consultados de novo
+    pendentes = chaves['ORIGEM'].isna()
+    chaves.loc[pendentes & chaves['CHAVE'].map(lambda chave: chave in bairros_falha_existentes), 'ORIGEM'] = 'falha_anterior'
 
-        if pd.notna(cache_distancias[bairro]):
-            bairros_sucesso.append(bairro)
+    # Os demais endereços são geocodificados de uma vez, concorrentemente; os que já estão no cache de
+    # geocodificação não geram consulta, e todos os localizados ganham coordenadas, não só a DISTANCIA_URCA
+    consultar = chaves['ORIGEM'].isna()
+    enderecos = chaves['BAIRRO'] + ', ' + chaves['CIDADE'] + ', ' + chaves['ESTADO']
+    if geocodificador is None:
+        geocodificador = GeocodificadorAssincrono(geolocator, cache)
+    pontos = geocodificador.geocodificar_lote(enderecos[consultar])
+    for posicao in chaves.index[consultar]:
+        ponto = pontos.get(enderecos[posicao])
+        if enderecos[posicao] not in pontos:
+            # Erro transitório (timeout, limite de requisições, serviço fora do ar): consultado de novo na próxima execução
+            chaves.loc[posicao, 'ORIGEM'] = 'pendente'
+        elif ponto:
+            chaves.loc[posicao, ['LATITUDE', 'LONGITUDE']] = ponto
+            chaves.loc[posicao, 'DISTANCIA_URCA'] = round(geodesic((latitude_urca, longitude_urca), ponto).km, 2)
+            chaves.loc[posicao, 'ORIGEM'] = 'geocodificacao'
+            cache_distancias[chaves.loc[posicao, 'CHAVE']] = chaves.loc[posicao, 'DISTANCIA_URCA']
         else:
-            bairros_falha.add(bairro)  # Adiciona o bairro na lista de falhas
-            bairros_falha_atual.add(bairro)  # Adiciona na lista de falhas desta execução
+            chaves.loc[posicao, 'ORIGEM'] = 'falha'
+            cache_distancias.setdefault(chaves.loc[posicao, 'CHAVE'], np.nan)
+    falhas = chaves['ORIGEM'] == 'falha'
+    # Os pendentes recebem uma distância provisória das alternativas abaixo, mas continuam marcados como pendentes
+    provisorios = chaves['ORIGEM'] == 'pendente'
+
+    # Sem coordenadas, a distância legada do dfDistancias para o mesmo endereço ainda vale para a DISTANCIA_URCA
+    sem_distancia = chaves['DISTANCIA_URCA'].isna()
+    distancia_legada = chaves.loc[sem_distancia, 'CHAVE'].map(lambda chave: cache_distancias.get(chave, np.nan))
+    legado = distancia_legada.index[distancia_legada > 0]
+    chaves.loc[legado, 'DISTANCIA_URCA'] = distancia_legada[legado]
+    chaves.loc[legado.difference(chaves.index[provisorios]), 'ORIGEM'] = 'dfDistancias'
+
+    # Último recurso: centroide do município, para endereços fora da capital que não foram localizados
+    sem_distancia = chaves['DISTANCIA_URCA'].isna()
+    coordenadas = localizar_offline(chaves[sem_distancia], centroides, niveis=('municipios',))
+    municipio = coordenadas.index[coordenadas['LATITUDE'].notna()]
+    chaves.loc[municipio, ['LATITUDE', 'LONGITUDE']] = coordenadas.loc[municipio, ['LATITUDE', 'LONGITUDE']]
+    chaves.loc[municipio, 'DISTANCIA_URCA'] = np.round(distancia_haversine(
+        chaves.loc[municipio, 'LATITUDE'], chaves.loc[municipio, 'LONGITUDE'], latitude_urca, longitude_urca), 2)
+    chaves.loc[municipio.difference(chaves.index[provisorios]), 'ORIGEM'] = 'municipio'
+
+    # Distribui o resultado para as linhas
+    colunas_resultado = ['LATITUDE', 'LONGITUDE', 'DISTANCIA_URCA', 'ORIGEM_DISTANCIA']
+    dataframe = dataframe.drop(columns=colunas_resultado, errors='ignore').join(
+        chaves.rename(columns={'ORIGEM': 'ORIGEM_DISTANCIA'}).set_index(colunas_chave)[colunas_resultado],
+        on=colunas_chave)
+
+    bairros_falha_atual = set(chaves.loc[falhas, 'CHAVE']) - bairros_falha_existentes
+    bairros_falha = bairros_falha_existentes | bairros_falha_atual
 
     # Atualiza o DataFrame de distâncias apenas se houver mudanças
-    new_df_distancias = pd.DataFrame(list(cache_distancias.items()), columns=['BAIRRO', 'DISTANCIA_URCA'])
+    new_df_distancias = pd.DataFrame([(*chave, distancia) for chave, distancia in cache_distancias.items()],
+                                     columns=COLUNAS_ENDERECO + ['DISTANCIA_URCA'])
 
-    # Printar o número de bairros processados e os bairros que falharam
-    print(Fore.GREEN + f"\nTotal de bairros processados com sucesso: {len(bairros_sucesso)}" + Style.RESET_ALL)
-    print(Fore.YELLOW + f"\nTotal de bairros que falharam: {len(bairros_falha_existentes) + len(bairros_falha_atual)}" + Style.RESET_ALL)
+    # Printar o número de endereços processados e os que falharam
+    sucesso = chaves['DISTANCIA_URCA'].notna()
+    print(Fore.GREEN + f"\nEndereços distintos com distância: {sucesso.sum()} de {len(chaves)} "
+          f"({chaves.loc[sucesso, 'REGISTROS'].sum()} registros)" + Style.RESET_ALL)
+    print(Fore.YELLOW + f"Endereços distintos sem distância: {(~sucesso).sum()} "
+          f"({chaves.loc[~sucesso, 'REGISTROS'].sum()} registros)" + Style.RESET_ALL)
+    print("Endereços por origem da distância: " +
+          ', '.join(f"{origem}: {quantidade}" for origem, quantidade in chaves['ORIGEM'].value_counts().items()))
+    print(Fore.YELLOW + f"Total de bairros que falharam: {len(bairros_falha)} "
+          f"({len(bairros_falha_atual)} novos nesta execução)" + Style.RESET_ALL)
+    print(f"Cache de geocodificação: {cache.acertos} acertos, {cache.consultas} consultas à API.")
 
+    if retornar_estatisticas:
+        return dataframe, new_df_distancias, bairros_falha, chaves.drop(columns='CHAVE')
     return dataframe, new_df_distancias, bairros_falha
 
 
+def adicionar_distancias_referencias(dataframe, referencias=None):
+    """
+    Adiciona uma coluna DISTANCIA_<NOME> para cada ponto de referência e a referência mais próxima
+    de cada aluno, a partir das colunas LATITUDE e LONGITUDE.
+    A matriz alunos x referências é calculada de uma vez; colunas de distância que já existirem
+    (como a DISTANCIA_URCA da etapa de geocodificação) são mantidas e apenas completadas. Alunos sem
+    coordenadas ficam sem referência mais próxima.
+    :param dataframe: DataFrame com as colunas LATITUDE e LONGITUDE.
+    :param referencias: Dicionário nome -> (latitude, longitude) (padrão: PONTOS_REFERENCIA).
+    :return: DataFrame com as colunas DISTANCIA_<NOME>, REFERENCIA_MAIS_PROXIMA e DISTANCIA_REFERENCIA_MAIS_PROXIMA.
+    """
+    referencias = PONTOS_REFERENCIA if referencias is None else referencias
+    colunas = [f'DISTANCIA_{nome}' for nome in referencias]
+    matriz = np.round(matriz_distancias(dataframe['LATITUDE'], dataframe['LONGITUDE'], list(referencias.values())), 2)
+
+    for posicao, coluna in enumerate(colunas):
+        calculada = pd.Series(matriz[:, posicao], index=dataframe.index)
+        dataframe[coluna] = dataframe[coluna].fillna(calculada) if coluna in dataframe.columns else calculada
+
+    # A referência mais próxima só é definida para alunos com coordenadas, que têm distância a todas as referências
+    distancias = dataframe[colunas].to_numpy(dtype=float)
+    com_distancia = ~np.isnan(matriz).any(axis=1)
+    mais_proxima = np.argmin(np.where(np.isnan(distancias), np.inf, distancias), axis=1)
+    nomes = np.array(list(referencias), dtype=object)
+    dataframe['REFERENCIA_MAIS_PROXIMA'] = np.where(com_distancia, nomes[mais_proxima], None)
+    dataframe['DISTANCIA_REFERENCIA_MAIS_PROXIMA'] = np.where(
+        com_distancia, distancias[np.arange(len(distancias)), mais_proxima], np.nan)
+    return dataframe
+
+
 # Uso do código
 if __name__ == "__main__":
     df = carregar_dados()
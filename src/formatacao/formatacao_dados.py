@@ -1,17 +1,49 @@
-import numpy as np
+import os
 import pandas as pd
-from src.formatacao.distancia import adicionar_distancia_ate_urca, inicializar_geolocator, salvar_bairros_falha, carregar_bairros_falha
+from src.formatacao.distancia import adicionar_distancia_ate_urca, inicializar_geolocator, salvar_bairros_falha, carregar_bairros_falha, \
+    adicionar_distancias_referencias, resolver_referencia_urca, PONTOS_REFERENCIA
+from src.formatacao.cache_geocodificacao import CacheGeocodificacao, CAMINHO_CACHE_GEOCODIFICACAO
+from src.formatacao.transporte import adicionar_distancia_transporte, CAMINHO_PARADAS_GTFS
+from src.formatacao.rede_viaria import adicionar_distancia_rede, CAMINHO_OSM
+from src.formatacao.centroides import atribuir_bairros_por_coordenadas, CAMINHO_LIMITES_BAIRROS
 from src.formatacao.localizacao import correcoes_bairros, agrupar_por_zona, correcoes_cidades, adicionar_cidade_estado
+from src.formatacao.correspondencia_aproximada import corrigir_bairros_aproximados, CAMINHO_CORRECOES_APROXIMADAS
 from src.formatacao.desempenho_academico import classificar_forma_ingresso, classificar_forma_evasao, arredondar_cra
-from src.formatacao.temporal import remover_alunos_anteriores_2014, classificar_idade, calcular_tempo_curso
+from src.formatacao.temporal import remover_alunos_anteriores_2014, classificar_idade, calcular_tempo_curso, formatar_periodos
 from src.utils.utils import carregar_dados, salvar_dados, pega_caminho_base, limpar_e_normalizar, corrigir_nomes
+from src.utils.cache_ingestao import ler_excel_com_cache
+from src.formatacao.incremental import calcular_impressoes, formatar_incremental, salvar_estado_incremental, \
+    calcular_impressoes_entradas
+from colorama import Fore, Style
+
+# Versão da lógica de formatação; alterações que mudam o resultado invalidam o estado incremental
+VERSAO_FORMATACAO = 10
+
+COLUNAS_DESNECESSARIAS = ['Seq.']
+
+# Arquivos externos lidos pelas etapas de formatação; qualquer mudança neles invalida o estado incremental
+ENTRADAS_EXTERNAS = {
+    'paradas_gtfs': CAMINHO_PARADAS_GTFS,
+    'extrato_osm': CAMINHO_OSM,
+    'limites_bairros': CAMINHO_LIMITES_BAIRROS,
+    'cache_geocodificacao': CAMINHO_CACHE_GEOCODIFICACAO,
+    'correcoes_aproximadas': CAMINHO_CORRECOES_APROXIMADAS,
+}
 
 
-def ler_dados_brutos(source):
+def ler_dados_brutos(source, usar_cache=True):
     """
-    Função para ler os dados brutos da planilha
+    Função para ler os dados brutos da planilha.
+    Com o cache ativo, a planilha só é decodificada novamente quando o conteúdo do arquivo muda.
     """
-    df = pd.read_excel(source)
+    if not usar_cache:
+        return pd.read_excel(source)
+
+    df, status = ler_excel_com_cache(source)
+    if status == 'hit':
+        print(Fore.GREEN + f"Cache de ingestão: hit ({os.path.basename(source)} não mudou)." + Style.RESET_ALL)
+    else:
+        print(Fore.YELLOW + f"Cache de ingestão: miss ({os.path.basename(source)} lido do Excel)." + Style.RESET_ALL)
     return df
 
 
@@ -29,22 +61,6 @@ def preencher_nulos(df, substituicoes):
     return df.fillna(substituicoes)
 
 
-def formatar_periodos(df):
-    """
-    Função para formatar os períodos de ingresso e evasão
-    """
-    for periodo in ['PERIODO_EVASAO', 'PERIODO_INGRESSO']:
-        df_temp = pd.DataFrame(df[periodo].str.split('/', expand=True))
-        df_temp.columns = ['ANO', periodo]
-        df_temp[periodo] = df_temp[periodo].str.extract('(\d+)', expand=False)
-        df['{}_FORMATADO'.format(periodo)] = df_temp['ANO'] + '.' + df_temp[periodo]
-        df[periodo] = df_temp[periodo]
-        df['ANO_{}'.format(periodo)] = df_temp['ANO']
-
-    df['PERIODO_INGRESSO_FORMATADO'] = df['PERIODO_INGRESSO_FORMATADO'].fillna('0.0')
-    return df
-
-
 def converter_tipos(df, tipo_campos):
     """
     Função para converter tipos de colunas no DataFrame.
@@ -55,30 +71,15 @@ def converter_tipos(df, tipo_campos):
     return df.astype(tipo_campos)
 
 
-from colorama import Fore, Style
-
-
-def formatar_dados(source, incluir_outros=True, dados_anterior_2014=False):
+def formatar_linhas(df, incluir_outros=True, dados_anterior_2014=False, pontos_referencia=None):
     """
-    Função principal para formatar os dados.
+    Aplica todas as etapas de formatação sobre as linhas brutas recebidas.
+    Todas as etapas operam linha a linha, então o DataFrame pode ser apenas parte da planilha.
+    pontos_referencia é um dicionário nome -> (latitude, longitude) (padrão: PONTOS_REFERENCIA).
     """
 
-    print(Fore.CYAN + "\n=== INICIANDO FORMATAÇÃO DE DADOS ===" + Style.RESET_ALL)
-
-    # Carregar os dados brutos da planilha
-    df = ler_dados_brutos(source)
-    print(f"Total de registros após leitura do arquivo: {len(df)}")
-
-    # Checando registros nulos ou inválidos nas colunas principais
-    colunas_verificacao = ['CRA', 'BAIRRO', 'CIDADE', 'ESTADO', 'FORMA_INGRESSO', 'FORMA_EVASAO']
-    for coluna in colunas_verificacao:
-        nulos = df[coluna].isna().sum()
-        vazios = (df[coluna] == '').sum()
-        if nulos > 0 or vazios > 0:
-            print(Fore.RED + f"Atenção: {nulos + vazios} registros com {coluna} nulo ou vazio." + Style.RESET_ALL)
-
     # Remover colunas desnecessárias
-    df = remover_colunas(df, ['Seq.'])
+    df = remover_colunas(df, COLUNAS_DESNECESSARIAS)
     print(f"Total de registros após remover colunas desnecessárias: {len(df)}")
 
     # Preencher valores nulos
@@ -86,8 +87,8 @@ def formatar_dados(source, incluir_outros=True, dados_anterior_2014=False):
     print(Fore.GREEN + f"Preenchimento de nulos para BAIRRO, CIDADE, ESTADO concluído." + Style.RESET_ALL)
     print(f"Total de registros após preencher nulos: {len(df)}")
 
-    # Formatar os períodos de ingresso e evasão
-    df = formatar_periodos(df)
+    # Formatar os períodos de ingresso e evasão (os textos _FORMATADO são mantidos no arquivo processado)
+    df = formatar_periodos(df, incluir_texto=True)
     print(f"Total de registros após formatar períodos: {len(df)}")
 
     # Aplicar a lógica de remoção de alunos anteriores a 2014
@@ -104,26 +105,25 @@ def formatar_dados(source, incluir_outros=True, dados_anterior_2014=False):
         'DT_NASCIMENTO': 'datetime64[ns]',
         'FORMA_INGRESSO': str,
         'FORMA_EVASAO': str,
-        'PERIODO_INGRESSO': np.float64,
+        'PERIODO_INGRESSO': 'Int16',
         'DT_EVASAO': 'datetime64[ns]',
-        'PERIODO_EVASAO': np.float64,
-        'ANO_PERIODO_EVASAO': np.float64,
+        'PERIODO_EVASAO': 'Int16',
+        'ANO_PERIODO_EVASAO': 'Int16',
         'PERIODO_INGRESSO_FORMATADO': str,
-        'ANO_PERIODO_INGRESSO': np.float64
+        'ANO_PERIODO_INGRESSO': 'Int16'
     }
     df = converter_tipos(df, tipo_campos)
     print(f"Total de registros após converter tipos: {len(df)}")
 
     # Normalizar e corrigir bairros
-    df = limpar_e_normalizar(df, 'BAIRRO', correcoes_bairros, case='title')
-    df = limpar_e_normalizar(df, 'BAIRRO', correcoes_bairros, case='lower')
+    df = limpar_e_normalizar(df, 'BAIRRO', case='lower')
     df = corrigir_nomes(df, 'BAIRRO', correcoes_bairros)
+    df = corrigir_bairros_aproximados(df, 'BAIRRO')
     print(Fore.GREEN + f"Correção e normalização de bairros concluída." + Style.RESET_ALL)
     print(f"Total de registros após normalizar e corrigir bairros: {len(df)}")
 
     # Normalizar e corrigir cidades
-    df = limpar_e_normalizar(df, 'CIDADE', correcoes_cidades, case='title')
-    df = limpar_e_normalizar(df, 'CIDADE', correcoes_cidades, case='lower')
+    df = limpar_e_normalizar(df, 'CIDADE', case='lower')
     df = corrigir_nomes(df, 'CIDADE', correcoes_cidades)
     print(Fore.GREEN + f"Correção e normalização de cidades concluída." + Style.RESET_ALL)
     print(f"Total de registros após normalizar e corrigir cidades: {len(df)}")
@@ -154,14 +154,87 @@ def formatar_dados(source, incluir_outros=True, dados_anterior_2014=False):
     df_distancias = carregar_dados(pega_caminho_base() + '/dados/processado/dfDistancias.csv')
     bairros_falha_existentes = carregar_bairros_falha()
     geolocator = inicializar_geolocator()
+    cache = CacheGeocodificacao()
+
+    # A Urca é resolvida uma vez e usada na DISTANCIA_URCA, nos pontos de referência e na malha viária
+    referencia_urca = resolver_referencia_urca(geolocator, cache)
+    pontos_referencia = dict(PONTOS_REFERENCIA if pontos_referencia is None else pontos_referencia)
+    if 'URCA' in pontos_referencia:
+        pontos_referencia['URCA'] = referencia_urca
 
     print(Fore.CYAN + f"\nIniciando cálculo de distâncias para Urca..." + Style.RESET_ALL)
-    df, df_distancias, bairros_falha_atualizado = adicionar_distancia_ate_urca(df, df_distancias, geolocator, bairros_falha_existentes)
+    df, df_distancias, bairros_falha_atualizado = adicionar_distancia_ate_urca(
+        df, df_distancias, geolocator, bairros_falha_existentes, cache=cache, referencia=referencia_urca)
     print(Fore.GREEN + f"Total de registros após adicionar distâncias: {len(df)}" + Style.RESET_ALL)
 
+    # Bairro e zona pelos polígonos de bairros, quando há coordenadas (a classificação textual fica como alternativa)
+    df = atribuir_bairros_por_coordenadas(df)
+    print(f"Total de registros após atribuir bairros pelas coordenadas: {len(df)}")
+
+    # Distâncias até os demais pontos de referência e referência mais próxima
+    df = adicionar_distancias_referencias(df, pontos_referencia)
+    print(f"Total de registros após calcular distâncias aos pontos de referência: {len(df)}")
+
+    # Estação de transporte mais próxima, a partir do feed GTFS local
+    df = adicionar_distancia_transporte(df)
+    print(f"Total de registros após calcular a estação de transporte mais próxima: {len(df)}")
+
+    # Distância até a Urca pela malha viária, a partir do extrato OSM local
+    df = adicionar_distancia_rede(df, referencia_urca)
+    print(f"Total de registros após calcular a distância pela malha viária: {len(df)}")
+
     salvar_dados(df_distancias, 'dados/processado/dfDistancias.csv')
     salvar_bairros_falha(bairros_falha_atualizado)  # Salvar a lista atualizada de bairros falhos
-    salvar_dados(df, 'dados/processado/dfPrincipal.csv')
+    cache.fechar()
+
+    return df
+
+
+def formatar_dados(source, incluir_outros=True, dados_anterior_2014=False, usar_cache=True, incremental=False,
+                   pontos_referencia=None):
+    """
+    Função principal para formatar os dados.
+    Com incremental=True, apenas as linhas novas ou alteradas desde a última execução são formatadas
+    (além das que ficaram com a distância pendente ou com falha). O estado incremental é descartado
+    quando algum dos arquivos de ENTRADAS_EXTERNAS muda.
+    """
+
+    print(Fore.CYAN + "\n=== INICIANDO FORMATAÇÃO DE DADOS ===" + Style.RESET_ALL)
+
+    # Carregar os dados brutos da planilha
+    df = ler_dados_brutos(source, usar_cache)
+    print(f"Total de registros após leitura do arquivo: {len(df)}")
+
+    # Checando registros nulos ou inválidos nas colunas principais
+    colunas_verificacao = ['CRA', 'BAIRRO', 'CIDADE', 'ESTADO', 'FORMA_INGRESSO', 'FORMA_EVASAO']
+    for coluna in colunas_verificacao:
+        nulos = df[coluna].isna().sum()
+        vazios = (df[coluna] == '').sum()
+        if nulos > 0 or vazios > 0:
+            print(Fore.RED + f"Atenção: {nulos + vazios} registros com {coluna} nulo ou vazio." + Style.RESET_ALL)
+
+    parametros = {
+        'versao': VERSAO_FORMATACAO,
+        'incluir_outros': incluir_outros,
+        'dados_anterior_2014': dados_anterior_2014,
+        'pontos_referencia': {nome: list(ponto) for nome, ponto in (pontos_referencia or PONTOS_REFERENCIA).items()},
+        'entradas': calcular_impressoes_entradas(ENTRADAS_EXTERNAS),
+    }
+    impressoes = calcular_impressoes(df, COLUNAS_DESNECESSARIAS)
+
+    def formatar(df_bruto):
+        return formatar_linhas(df_bruto, incluir_outros, dados_anterior_2014, pontos_referencia)
+
+    if incremental:
+        df = formatar_incremental(df, impressoes, formatar, parametros)
+    else:
+        df = formatar(df)
+
+    # A própria execução pode atualizar o cache de geocodificação e as correções aproximadas; o estado
+    # salvo corresponde ao conteúdo desses arquivos ao final dela
+    parametros['entradas'] = calcular_impressoes_entradas(ENTRADAS_EXTERNAS)
+    salvar_estado_incremental(df, impressoes, parametros)
+    salvar_dados(df, 'dados/processado/dfPrincipal.parquet')
 
     print(Fore.GREEN + 'DataFrame formatado, classificado e salvo com sucesso!' + Style.RESET_ALL)
 
@@ -0,0 +1,143 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+from src.formatacao.cache_geocodificacao import STATUS_ENCONTRADO, STATUS_NAO_ENCONTRADO, INTERVALO_CONSULTAS
+
+TENTATIVAS = 3
+ESPERA_INICIAL = 1.0
+# Quantidade de resultados acumulados antes de cada gravação no cache (checkpoint)
+TAMANHO_LOTE = 10
+
+
+class LimitadorTaxa:
+    def __init__(self, taxa, capacidade=1):
+        """
+        Balde de fichas (token bucket) para limitar a taxa de requisições de um cliente asyncio.
+
+        :param taxa: Fichas repostas por segundo (requisições por segundo permitidas).
+        :param capacidade: Máximo de fichas acumuladas, ou seja, o tamanho da rajada permitida.
+        """
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.fichas = capacidade
+        self.ultima_reposicao = time.monotonic()
+        self._trava = asyncio.Lock()
+
+    async def adquirir(self):
+        """
+        Aguarda até haver uma ficha disponível e a consome.
+        """
+        async with self._trava:
+            while True:
+                agora = time.monotonic()
+                self.fichas = min(self.capacidade, self.fichas + (agora - self.ultima_reposicao) * self.taxa)
+                self.ultima_reposicao = agora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                await asyncio.sleep((1 - self.fichas) / self.taxa)
+
+
+class GeocodificadorAssincrono:
+    def __init__(self, geolocator, cache, taxa=1 / INTERVALO_CONSULTAS, capacidade=1, tentativas=TENTATIVAS,
+                 espera_inicial=ESPERA_INICIAL, tamanho_lote=TAMANHO_LOTE):
+        """
+        Geocodifica vários endereços de forma concorrente, respeitando um limite de requisições
+        por segundo. As chamadas ao geolocator (bloqueantes) rodam em threads; o limite é aplicado
+        no início de cada requisição, então a vazão chega à taxa permitida independentemente da
+        latência da API. Os resultados são gravados no cache em pequenos lotes à medida que chegam,
+        então uma execução interrompida é retomada a partir do último lote gravado.
+
+        :param geolocator: Objeto geolocator do geopy.
+        :param cache: CacheGeocodificacao onde os resultados são consultados e gravados.
+        :param taxa: Requisições por segundo permitidas.
+        :param capacidade: Rajada máxima de requisições.
+        :param tentativas: Número máximo de tentativas por endereço em caso de timeout ou erro do serviço.
+        :param espera_inicial: Espera, em segundos, antes da segunda tentativa; dobra a cada nova falha.
+                               Quando o serviço informa quanto esperar (Retry-After), espera ao menos isso.
+        :param tamanho_lote: Quantidade de resultados gravados no cache de cada vez.
+        """
+        self.geolocator = geolocator
+        self.cache = cache
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.tamanho_lote = tamanho_lote
+
+    async def _consultar(self, endereco, limitador):
+        """
+        Consulta um endereço, com novas tentativas e espera exponencial. Em um GeocoderRateLimited
+        (HTTP 429), a espera é de pelo menos o `retry_after` pedido pelo serviço.
+        :return: Tupla (endereço, resposta), onde a resposta é o objeto Location do geopy, None se não
+                 encontrado, ou a exceção da última tentativa.
+        """
+        for tentativa in range(self.tentativas):
+            await limitador.adquirir()
+            try:
+                self.cache.consultas += 1
+                return endereco, await asyncio.to_thread(self.geolocator.geocode, endereco)
+            except (GeocoderTimedOut, GeocoderServiceError) as e:
+                if tentativa == self.tentativas - 1:
+                    return endereco, e
+                await asyncio.sleep(max(self.espera_inicial * 2 ** tentativa, getattr(e, 'retry_after', None) or 0))
+
+    async def geocodificar_varios(self, enderecos):
+        """
+        Versão assíncrona de `geocodificar_lote`.
+        """
+        enderecos = list(dict.fromkeys(enderecos))
+        resultados = {}
+        pendentes = []
+        for endereco in enderecos:
+            em_cache = self.cache.obter(endereco)
+            if em_cache is None:
+                pendentes.append(endereco)
+            else:
+                self.cache.acertos += 1
+                latitude, longitude, status = em_cache
+                resultados[endereco] = (latitude, longitude) if status == STATUS_ENCONTRADO else None
+
+        limitador = LimitadorTaxa(self.taxa, self.capacidade)
+        tarefas = [asyncio.ensure_future(self._consultar(endereco, limitador)) for endereco in pendentes]
+        lote = []
+        try:
+            for proxima in asyncio.as_completed(tarefas):
+                endereco, local = await proxima
+                if isinstance(local, Exception):
+                    print(f"Erro ao geolocalizar {endereco}: {local}")
+                    continue
+                if local:
+                    resultados[endereco] = (local.latitude, local.longitude)
+                    lote.append((endereco, local.latitude, local.longitude, STATUS_ENCONTRADO))
+                else:
+                    resultados[endereco] = None
+                    lote.append((endereco, None, None, STATUS_NAO_ENCONTRADO))
+                if len(lote) >= self.tamanho_lote:
+                    self.cache.gravar_varios(lote)
+                    lote = []
+        finally:
+            # Em caso de interrupção, os resultados já recebidos também são gravados
+            for tarefa in tarefas:
+                tarefa.cancel()
+            if lote:
+                self.cache.gravar_varios(lote)
+        return resultados
+
+    def geocodificar_lote(self, enderecos):
+        """
+        Geocodifica uma lista de endereços, consultando a API apenas para os que não estão no cache.
+        :param enderecos: Endereços a serem geocodificados (duplicados são consultados uma vez).
+        :return: Dicionário endereço -> (latitude, longitude) ou None. Endereços que falharam em
+                 todas as tentativas ficam fora do dicionário.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.geocodificar_varios(enderecos))
+
+        # Já existe um laço de eventos nesta thread (ex: Jupyter); o lote roda em outra thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.geocodificar_varios(enderecos)).result()
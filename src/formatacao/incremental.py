@@ -0,0 +1,162 @@
+import json
+import os
+import pandas as pd
+from colorama import Fore, Style
+
+from src.utils.cache_ingestao import calcular_hash_arquivo
+from src.utils.utils import pega_caminho_base, restaurar_nulos_texto
+
+PASTA_ESTADO_INCREMENTAL = os.path.join('dados', 'cache', 'incremental')
+COLUNA_IMPRESSAO = 'IMPRESSAO_LINHA'
+COLUNA_CHAVE = 'CHAVE_LINHA'
+
+# Colunas pseudonimizadas que identificam o aluno, em ordem de preferência
+COLUNAS_CHAVE = ['MATR_ALUNO', 'ID_PESSOA']
+
+# Linhas cuja distância ficou pendente ou falhou nunca são reaproveitadas: são formatadas de novo a cada execução
+COLUNA_ORIGEM_DISTANCIA = 'ORIGEM_DISTANCIA'
+ORIGENS_REFAZER = ('pendente', 'falha', 'falha_anterior')
+
+
+def _caminhos_estado(pasta_estado=None):
+    pasta = os.path.join(pega_caminho_base(), pasta_estado or PASTA_ESTADO_INCREMENTAL)
+    return {
+        'pasta': pasta,
+        'formatado': os.path.join(pasta, 'formatado.parquet'),
+        'impressoes': os.path.join(pasta, 'impressoes.parquet'),
+        'parametros': os.path.join(pasta, 'parametros.json'),
+    }
+
+
+def calcular_impressoes(df, colunas_ignoradas=()):
+    """
+    Calcula a impressão digital de cada linha bruta: a chave pseudonimizada do aluno
+    (quando existir) e um hash do conteúdo completo da linha.
+    :param df: DataFrame bruto.
+    :param colunas_ignoradas: Colunas que não influenciam a formatação (ex: 'Seq.').
+    :return: DataFrame com as colunas CHAVE_LINHA e IMPRESSAO_LINHA, com o mesmo índice de df.
+    """
+    colunas = [coluna for coluna in df.columns if coluna not in colunas_ignoradas]
+    colunas_chave = [coluna for coluna in COLUNAS_CHAVE if coluna in colunas][:1]
+
+    impressoes = pd.DataFrame(index=df.index)
+    impressoes[COLUNA_IMPRESSAO] = pd.util.hash_pandas_object(df[colunas], index=False).astype('uint64')
+    if colunas_chave:
+        impressoes[COLUNA_CHAVE] = pd.util.hash_pandas_object(df[colunas_chave], index=False).astype('uint64')
+    else:
+        impressoes[COLUNA_CHAVE] = impressoes[COLUNA_IMPRESSAO]
+    return impressoes
+
+
+def calcular_impressoes_entradas(entradas):
+    """
+    Calcula o hash do conteúdo de cada arquivo externo lido pela formatação (feed GTFS, extrato OSM,
+    limites de bairros, caches), para que o estado incremental seja descartado quando algum mudar.
+    :param entradas: Dicionário nome -> caminho, relativo à raiz do projeto.
+    :return: Dicionário nome -> hash do conteúdo, ou None para arquivos que não existem.
+    """
+    impressoes = {}
+    for nome, caminho in entradas.items():
+        caminho_completo = os.path.join(pega_caminho_base(), caminho)
+        impressoes[nome] = calcular_hash_arquivo(caminho_completo) if os.path.exists(caminho_completo) else None
+    return impressoes
+
+
+def carregar_estado_incremental(parametros, pasta_estado=None):
+    """
+    Carrega o resultado da formatação anterior, se ele foi gerado com os mesmos parâmetros.
+    :param parametros: Dicionário com os parâmetros da formatação atual.
+    :param pasta_estado: Pasta do estado, relativa à raiz do projeto (opcional).
+    :return: Tupla (DataFrame formatado, DataFrame de impressões) ou None.
+    """
+    caminhos = _caminhos_estado(pasta_estado)
+    if not all(os.path.exists(caminhos[nome]) for nome in ('formatado', 'impressoes', 'parametros')):
+        return None
+
+    with open(caminhos['parametros'], encoding='utf-8') as arquivo:
+        if json.load(arquivo) != parametros:
+            print(Fore.YELLOW + "Parâmetros de formatação mudaram, o estado incremental será ignorado." + Style.RESET_ALL)
+            return None
+
+    formatado = restaurar_nulos_texto(pd.read_parquet(caminhos['formatado']))
+    return formatado, pd.read_parquet(caminhos['impressoes'])
+
+
+def salvar_estado_incremental(df_formatado, impressoes, parametros, pasta_estado=None):
+    """
+    Salva o resultado formatado junto com as impressões de todas as linhas brutas processadas,
+    inclusive as que foram descartadas por algum filtro.
+    :param df_formatado: DataFrame formatado, com o índice das linhas brutas.
+    :param impressoes: DataFrame de impressões das linhas brutas (ver calcular_impressoes).
+    :param parametros: Dicionário com os parâmetros da formatação.
+    :param pasta_estado: Pasta do estado, relativa à raiz do projeto (opcional).
+    """
+    caminhos = _caminhos_estado(pasta_estado)
+    os.makedirs(caminhos['pasta'], exist_ok=True)
+
+    formatado = df_formatado.copy()
+    formatado[COLUNA_IMPRESSAO] = impressoes.loc[df_formatado.index, COLUNA_IMPRESSAO].values
+
+    for nome, dados in (('formatado', formatado), ('impressoes', impressoes)):
+        temporario = caminhos[nome] + '.tmp'
+        dados.to_parquet(temporario, index=False, engine='pyarrow')
+        os.replace(temporario, caminhos[nome])
+
+    temporario = caminhos['parametros'] + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(parametros, arquivo)
+    os.replace(temporario, caminhos['parametros'])
+
+
+def formatar_incremental(df_bruto, impressoes, formatar, parametros, pasta_estado=None):
+    """
+    Formata apenas as linhas novas ou alteradas desde a última execução e reaproveita o
+    resultado anterior para as demais. Como todas as etapas da formatação operam linha a linha,
+    o resultado combinado é igual ao de uma reconstrução completa. Linhas inalteradas cuja
+    distância ficou pendente ou falhou (ORIGENS_REFAZER) também são formatadas de novo.
+    :param df_bruto: DataFrame bruto.
+    :param impressoes: Impressões das linhas brutas (ver calcular_impressoes).
+    :param formatar: Função que recebe um DataFrame bruto e devolve o DataFrame formatado.
+    :param parametros: Dicionário com os parâmetros da formatação atual.
+    :param pasta_estado: Pasta do estado, relativa à raiz do projeto (opcional).
+    :return: DataFrame formatado.
+    """
+    estado = carregar_estado_incremental(parametros, pasta_estado)
+    if estado is None:
+        print(Fore.YELLOW + "Nenhum estado incremental válido encontrado. Formatando todas as linhas..." + Style.RESET_ALL)
+        return formatar(df_bruto)
+
+    formatado_anterior, impressoes_anteriores = estado
+    inalteradas = impressoes[COLUNA_IMPRESSAO].isin(impressoes_anteriores[COLUNA_IMPRESSAO])
+    chaves_conhecidas = impressoes[COLUNA_CHAVE].isin(impressoes_anteriores[COLUNA_CHAVE])
+    removidas = ~impressoes_anteriores[COLUNA_CHAVE].isin(impressoes[COLUNA_CHAVE])
+
+    if COLUNA_ORIGEM_DISTANCIA in formatado_anterior.columns:
+        provisorias = formatado_anterior.loc[
+            formatado_anterior[COLUNA_ORIGEM_DISTANCIA].isin(ORIGENS_REFAZER), COLUNA_IMPRESSAO]
+        refazer = inalteradas & impressoes[COLUNA_IMPRESSAO].isin(provisorias)
+    else:
+        refazer = pd.Series(False, index=impressoes.index)
+    a_formatar = ~inalteradas | refazer
+
+    print(Fore.CYAN + "Formatação incremental:" + Style.RESET_ALL)
+    print(f"  Linhas inalteradas (reaproveitadas): {(inalteradas & ~refazer).sum()}")
+    print(f"  Linhas alteradas: {(~inalteradas & chaves_conhecidas).sum()}")
+    print(f"  Linhas novas: {(~chaves_conhecidas).sum()}")
+    print(f"  Linhas removidas desde a última execução: {removidas.sum()}")
+    print(f"  Linhas inalteradas com distância pendente ou com falha (refeitas): {refazer.sum()}")
+
+    # Linhas inalteradas que sobreviveram aos filtros da execução anterior recebem o índice atual
+    formatado_anterior = formatado_anterior.drop_duplicates(COLUNA_IMPRESSAO).set_index(COLUNA_IMPRESSAO)
+    reaproveitar = impressoes.loc[~a_formatar, COLUNA_IMPRESSAO]
+    reaproveitar = reaproveitar[reaproveitar.isin(formatado_anterior.index)]
+    df_reaproveitado = formatado_anterior.loc[reaproveitar.values]
+    df_reaproveitado.index = reaproveitar.index.rename(df_bruto.index.name)
+
+    if not a_formatar.any():
+        return df_reaproveitado
+
+    df_novas = formatar(df_bruto[a_formatar])
+    if df_reaproveitado.empty:
+        return df_novas
+    return pd.concat([df_reaproveitado, df_novas[df_reaproveitado.columns]]).sort_index()
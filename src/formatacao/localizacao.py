@@ -1,4 +1,6 @@
 import re
+import numpy as np
+import pandas as pd
 import unidecode
 from src.formatacao.zonas_geograficas import *
 
@@ -31,65 +33,120 @@ def normalizar(texto):
     return texto
 
 
-def verificar_bairro_em_zonas(bairro):
-    bairro_normalizado = normalizar(bairro)
-
-    for zona, lista_bairros in [
-        ('Zona Norte', zona_norte),
-        ('Zona Oeste', zona_oeste),
-        ('Zona Sul', zona_sul),
-        ('Centro', bairros_centro),
-        ('Baixada Fluminense', baixada_fluminense),
-        ('Niterói/São Gonçalo', niteroi_sao_goncalo),
-        ('Região Serrana', regiao_serrana),
-        ('Região dos Lagos', regiao_dos_lagos)
-    ]:
-        for bairro_zona in lista_bairros:
-            bairro_zona_normalizado = normalizar(bairro_zona)
-            if bairro_normalizado == bairro_zona_normalizado:
-                return zona
-
-    return None
+# Zonas verificadas para bairros e regiões verificadas para cidades, em ordem de prioridade
+ZONAS_BAIRROS = [
+    ('Zona Norte', zona_norte),
+    ('Zona Oeste', zona_oeste),
+    ('Zona Sul', zona_sul),
+    ('Centro', bairros_centro),
+    ('Baixada Fluminense', baixada_fluminense),
+    ('Niterói/São Gonçalo', niteroi_sao_goncalo),
+    ('Região Serrana', regiao_serrana),
+    ('Região dos Lagos', regiao_dos_lagos)
+]
+
+REGIOES_CIDADES = [
+    ('Baixada Fluminense', baixada_fluminense),
+    ('Niterói/São Gonçalo', niteroi_sao_goncalo),
+    ('Região Serrana', regiao_serrana),
+    ('Região dos Lagos', regiao_dos_lagos),
+    ('Volta Redonda', regiao_volta_redonda),
+    ('Campos dos Goytacazes', regiao_campos)
+]
+
+
+def montar_indice_zonas(grupos):
+    """
+    Monta um dicionário nome normalizado -> zona. Quando um nome aparece em mais de uma lista,
+    vale a primeira zona, como na busca sequencial.
+    """
+    indice = {}
+    for zona, nomes in grupos:
+        for nome in nomes:
+            indice.setdefault(normalizar(nome), zona)
+    return indice
 
 
-def verificar_cidade_em_regioes(cidade):
-    cidade_normalizada = normalizar(cidade)
+def mapear_valores_unicos(serie, funcao):
+    """
+    Aplica a função apenas sobre os valores distintos da série e distribui o resultado
+    para todas as linhas. Valores nulos resultam em None.
+    """
+    codigos, unicos = pd.factorize(serie)
+    resultados = np.array([funcao(valor) for valor in unicos] + [None], dtype=object)
+    return resultados[codigos]
+
+
+class ClassificadorZonas:
+    def __init__(self, zonas_bairros=None, regioes_cidades=None):
+        """
+        Classifica bairros e cidades em zonas geográficas usando índices pré-computados
+        (nome normalizado -> zona). É compartilhado pela formatação e pelas análises geográficas.
+
+        :param zonas_bairros: Lista de (zona, bairros) em ordem de prioridade (padrão: ZONAS_BAIRROS).
+        :param regioes_cidades: Lista de (região, cidades) em ordem de prioridade (padrão: REGIOES_CIDADES).
+        """
+        self.indice_bairros = montar_indice_zonas(ZONAS_BAIRROS if zonas_bairros is None else zonas_bairros)
+        self.indice_cidades = montar_indice_zonas(REGIOES_CIDADES if regioes_cidades is None else regioes_cidades)
+        self._zonas_bairros = {}
+        self._regioes_cidades = {}
+
+    def zona_do_bairro(self, bairro):
+        """
+        Retorna a zona do bairro ou None, se o bairro não estiver em nenhuma lista.
+        """
+        if bairro not in self._zonas_bairros:
+            self._zonas_bairros[bairro] = self.indice_bairros.get(normalizar(bairro))
+        return self._zonas_bairros[bairro]
+
+    def regiao_da_cidade(self, cidade):
+        """
+        Retorna a região da cidade ou None, se a cidade não estiver em nenhuma lista.
+        """
+        if cidade not in self._regioes_cidades:
+            self._regioes_cidades[cidade] = self.indice_cidades.get(normalizar(cidade))
+        return self._regioes_cidades[cidade]
+
+    def classificar(self, bairro, cidade, estado):
+        """
+        Classifica um único endereço: fora do RJ, zona do bairro, região da cidade ou 'Outros'.
+        """
+        if estado.lower() != 'rio de janeiro':
+            return 'Outro Estado'
+        return self.zona_do_bairro(bairro) or self.regiao_da_cidade(cidade) or 'Outros'
 
-    for regiao, lista_cidades in [
-        ('Baixada Fluminense', baixada_fluminense),
-        ('Niterói/São Gonçalo', niteroi_sao_goncalo),
-        ('Região Serrana', regiao_serrana),
-        ('Região dos Lagos', regiao_dos_lagos),
-        ('Volta Redonda', regiao_volta_redonda),
-        ('Campos dos Goytacazes', regiao_campos)
-    ]:
-        for cidade_regiao in lista_cidades:
-            cidade_regiao_normalizada = normalizar(cidade_regiao)
-            if cidade_normalizada == cidade_regiao_normalizada:
-                return regiao
+    def classificar_dataframe(self, df, coluna_bairro='BAIRRO', coluna_cidade='CIDADE', coluna_estado='ESTADO'):
+        """
+        Classifica todas as linhas do DataFrame, consultando os índices uma vez por valor distinto.
+        :return: Array com a zona de cada linha.
+        """
+        fora_do_estado = (df[coluna_estado].str.lower() != 'rio de janeiro').to_numpy(dtype=bool)
+        zona_bairro = mapear_valores_unicos(df[coluna_bairro], self.zona_do_bairro)
+        zona_cidade = mapear_valores_unicos(df[coluna_cidade], self.regiao_da_cidade)
+        return np.select(
+            [fora_do_estado, pd.notna(zona_bairro), pd.notna(zona_cidade)],
+            ['Outro Estado', zona_bairro, zona_cidade],
+            default='Outros'
+        )
 
-    return None
 
+# Instância única, com os índices montados na importação do módulo
+classificador_zonas = ClassificadorZonas()
 
-def agrupar_por_zona(df):
-    """
-    Função para agrupar os bairros do Rio de Janeiro por zona.
-    """
 
-    def get_zona(bairro, cidade, estado):
-        if estado.lower() != 'rio de janeiro':
-            return 'Outro Estado'
+def verificar_bairro_em_zonas(bairro):
+    return classificador_zonas.zona_do_bairro(bairro)
 
-        zona_bairro = verificar_bairro_em_zonas(bairro)
-        if zona_bairro:
-            return zona_bairro
 
-        zona_cidade = verificar_cidade_em_regioes(cidade)
-        if zona_cidade:
-            return zona_cidade
+def verificar_cidade_em_regioes(cidade):
+    return classificador_zonas.regiao_da_cidade(cidade)
 
-        return 'Outros'
 
+def agrupar_por_zona(df):
+    """
+    Função para agrupar os bairros do Rio de Janeiro por zona.
+    A classificação é feita uma vez por bairro/cidade distinto e depois distribuída para as linhas.
+    """
     # Adiciona a coluna 'ZONA' ao DataFrame
-    df['ZONA'] = df.apply(lambda row: get_zona(row['BAIRRO'], row['CIDADE'], row['ESTADO']), axis=1)
+    df['ZONA'] = classificador_zonas.classificar_dataframe(df)
     return df
@@ -0,0 +1,186 @@
+import os
+import pickle
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+from colorama import Fore, Style
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
+
+from src.formatacao.centroides import distancia_haversine
+from src.formatacao.transporte import coordenadas_cartesianas, corda_para_km
+from src.utils.cache_ingestao import calcular_hash_arquivo
+from src.utils.utils import pega_caminho_base
+
+CAMINHO_OSM = os.path.join('dados', 'osm', 'rio.osm')
+PASTA_CACHE_REDE = os.path.join('dados', 'cache', 'rede')
+VERSAO_CACHE_REDE = 3
+
+# Pontos a mais do que isso do nó mais próximo estão fora do recorte do OSM e ficam sem distância
+DISTANCIA_MAXIMA_ENCAIXE_KM = 2.0
+
+# Vias que não fazem parte da rede de deslocamento
+VIAS_IGNORADAS = {'footway', 'path', 'steps', 'cycleway', 'bridleway', 'pedestrian', 'corridor', 'elevator',
+                  'platform', 'construction', 'proposed', 'abandoned', 'raceway'}
+
+
+def ler_rede_osm(caminho):
+    """
+    Lê um extrato OSM em XML e monta o grafo dirigido das vias, respeitando as vias de mão única.
+    O XML é lido em fluxo, e cada elemento de primeiro nível é descartado da raiz assim que é
+    processado, para que a memória não cresça com o tamanho do extrato.
+    :param caminho: Caminho completo do arquivo .osm.
+    :return: Tupla (coordenadas dos nós [n x 2, latitude/longitude], matriz esparsa de distâncias em km).
+    """
+    coordenadas = {}
+    vias = []
+    eventos = ET.iterparse(caminho, events=('start', 'end'))
+    _, raiz = next(eventos)
+    for evento, elemento in eventos:
+        if evento != 'end':
+            continue
+        if elemento.tag == 'node':
+            coordenadas[elemento.get('id')] = (float(elemento.get('lat')), float(elemento.get('lon')))
+        elif elemento.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in elemento.iter('tag')}
+            if tags.get('highway') and tags['highway'] not in VIAS_IGNORADAS:
+                nos = [no.get('ref') for no in elemento.iter('nd')]
+                mao_unica = tags.get('oneway', 'no')
+                if tags.get('junction') == 'roundabout' and mao_unica == 'no':
+                    mao_unica = 'yes'
+                if mao_unica == '-1':
+                    nos.reverse()
+                vias.append((nos, mao_unica in ('yes', 'true', '1', '-1')))
+        if elemento.tag in ('node', 'way', 'relation'):
+            raiz.clear()
+
+    # Apenas os nós usados por alguma via entram no grafo
+    indices = {}
+    origens, destinos = [], []
+    for nos, mao_unica in vias:
+        nos = [no for no in nos if no in coordenadas]
+        for no in nos:
+            indices.setdefault(no, len(indices))
+        for a, b in zip(nos[:-1], nos[1:]):
+            origens.append(indices[a])
+            destinos.append(indices[b])
+            if not mao_unica:
+                origens.append(indices[b])
+                destinos.append(indices[a])
+
+    pontos = np.array([coordenadas[no] for no in indices], dtype=float).reshape(-1, 2)
+    origens = np.asarray(origens, dtype=np.int64)
+    destinos = np.asarray(destinos, dtype=np.int64)
+    comprimentos = distancia_haversine(pontos[origens, 0], pontos[origens, 1], pontos[destinos, 0], pontos[destinos, 1])
+
+    # A conversão para CSR soma entradas repetidas; trechos compartilhados por mais de uma via (ou
+    # repetidos na mesma via) ficam com uma única aresta, a de menor comprimento
+    arestas = pd.DataFrame({'origem': origens, 'destino': destinos, 'comprimento': comprimentos})
+    arestas = arestas.groupby(['origem', 'destino'], as_index=False, sort=False)['comprimento'].min()
+    grafo = coo_matrix((arestas['comprimento'].to_numpy(), (arestas['origem'].to_numpy(), arestas['destino'].to_numpy())),
+                       shape=(len(pontos), len(pontos))).tocsr()
+    return pontos, grafo
+
+
+class DistanciasRede:
+    def __init__(self, referencia, caminho=CAMINHO_OSM, pasta_cache=PASTA_CACHE_REDE):
+        """
+        Distância pela malha viária até um ponto de referência, a partir de um extrato OSM local.
+        Como a referência é a mesma para todos os alunos, basta um único Dijkstra (no grafo
+        transposto, ou seja, de cada nó até a referência). A referência e os alunos são encaixados
+        apenas em nós da maior componente fortemente conexa, para que um fragmento isolado do
+        recorte não deixe todas as distâncias sem caminho. O resultado, a árvore de encaixe dos nós e
+        a tabela coordenada -> distância já consultada ficam em cache no disco.
+
+        :param referencia: Tupla (latitude, longitude) do ponto de referência.
+        :param caminho: Caminho do extrato .osm, relativo à raiz do projeto.
+        :param pasta_cache: Pasta do cache, relativa à raiz do projeto.
+        """
+        self.referencia = tuple(float(valor) for valor in referencia)
+        self.caminho = os.path.join(pega_caminho_base(), caminho)
+        self.pasta_cache = os.path.join(pega_caminho_base(), pasta_cache)
+        self.disponivel = os.path.exists(self.caminho)
+        self.tabela = {}
+        self._novos = 0
+        if not self.disponivel:
+            print(Fore.YELLOW + f"Extrato OSM não encontrado: {self.caminho}" + Style.RESET_ALL)
+            return
+
+        chave = f'{calcular_hash_arquivo(self.caminho)}__{self.referencia[0]:.6f}_{self.referencia[1]:.6f}'
+        self.caminho_cache = os.path.join(self.pasta_cache, f'distancias_rede__v{VERSAO_CACHE_REDE}__{chave}.pkl')
+        if os.path.exists(self.caminho_cache):
+            with open(self.caminho_cache, 'rb') as arquivo:
+                self.arvore, self.distancias_nos, self.tabela = pickle.load(arquivo)
+        else:
+            self._calcular()
+
+    def _calcular(self):
+        print(Fore.CYAN + "Calculando distâncias pela malha viária (Dijkstra a partir da referência)..." + Style.RESET_ALL)
+        pontos, grafo = ler_rede_osm(self.caminho)
+        _, componentes = connected_components(grafo, directed=True, connection='strong')
+        principal = np.flatnonzero(componentes == np.bincount(componentes).argmax())
+
+        # A árvore de encaixe só tem nós da maior componente; distancias_nos segue a mesma ordem
+        self.arvore = cKDTree(coordenadas_cartesianas(pontos[principal, 0], pontos[principal, 1]))
+        _, no_referencia = self.arvore.query(coordenadas_cartesianas([self.referencia[0]], [self.referencia[1]])[0])
+        distancias = dijkstra(grafo.T.tocsr(), directed=True, indices=int(principal[no_referencia]))
+        self.distancias_nos = distancias[principal]
+        self._novos = 1
+        self.salvar()
+
+    def distancias(self, latitude, longitude):
+        """
+        Distância pela malha viária de cada ponto até a referência, em km (NaN sem coordenadas, fora
+        do recorte ou sem caminho). Inclui o trecho em linha reta do ponto até o nó mais próximo.
+        Pontos já consultados são respondidos pela tabela em cache.
+        """
+        latitude = np.asarray(latitude, dtype=float)
+        longitude = np.asarray(longitude, dtype=float)
+        resultado = np.full(len(latitude), np.nan)
+        if not self.disponivel:
+            return resultado
+
+        chaves = pd.Series(list(zip(np.round(latitude, 6), np.round(longitude, 6))))
+        validos = ~(np.isnan(latitude) | np.isnan(longitude))
+        novos = [chave for chave in pd.unique(chaves[validos]) if chave not in self.tabela]
+        if novos:
+            pontos = np.array(novos, dtype=float)
+            cordas, nos = self.arvore.query(coordenadas_cartesianas(pontos[:, 0], pontos[:, 1]))
+            encaixe = corda_para_km(cordas)
+            distancias = np.where(encaixe <= DISTANCIA_MAXIMA_ENCAIXE_KM, self.distancias_nos[nos] + encaixe, np.nan)
+            distancias[np.isinf(distancias)] = np.nan
+            self.tabela.update(zip(novos, np.round(distancias, 2)))
+            self._novos += len(novos)
+
+        resultado[validos] = [self.tabela[chave] for chave in chaves[validos]]
+        return resultado
+
+    def salvar(self):
+        """
+        Grava o cache, se houver novidades.
+        """
+        if not self.disponivel or not self._novos:
+            return
+        os.makedirs(self.pasta_cache, exist_ok=True)
+        temporario = self.caminho_cache + '.tmp'
+        with open(temporario, 'wb') as arquivo:
+            pickle.dump((self.arvore, self.distancias_nos, self.tabela), arquivo)
+        os.replace(temporario, self.caminho_cache)
+        self._novos = 0
+
+
+def adicionar_distancia_rede(dataframe, referencia, nome='URCA', caminho=CAMINHO_OSM):
+    """
+    Adiciona a coluna DISTANCIA_REDE_<NOME>, com a distância pela malha viária até a referência,
+    ao lado da DISTANCIA_<NOME> em linha reta.
+    :param dataframe: DataFrame com as colunas LATITUDE e LONGITUDE.
+    :param referencia: Tupla (latitude, longitude) da referência.
+    :param nome: Nome da referência, usado no nome da coluna.
+    :param caminho: Caminho do extrato .osm, relativo à raiz do projeto.
+    :return: DataFrame com a nova coluna.
+    """
+    rede = DistanciasRede(referencia, caminho)
+    dataframe[f'DISTANCIA_REDE_{nome}'] = rede.distancias(dataframe['LATITUDE'], dataframe['LONGITUDE'])
+    rede.salvar()
+    return dataframe
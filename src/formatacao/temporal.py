@@ -1,112 +1,192 @@
+import re
+from datetime import MINYEAR, MAXYEAR
 import numpy as np
 import pandas as pd
 
+COLUNAS_PERIODO = ['PERIODO_EVASAO', 'PERIODO_INGRESSO']
 
-def formatar_periodos(df):
+# Semestres regulares; outros códigos (verão, períodos especiais) não têm índice
+SEMESTRES_VALIDOS = (1, 2)
+
+# Ano antes da barra e o primeiro número depois dela: '2014/1°. semestre' -> ('2014', '1')
+PADRAO_PERIODO = re.compile(r'^\s*(?P<ano>\d+)\s*(?:/\D*(?P<semestre>\d+))?')
+
+
+def formatar_periodos(df, incluir_texto=True):
     """
-    Função para formatar os períodos de ingresso e evasão.
+    Função para formatar os períodos de ingresso e evasão ('2014/1°. semestre').
+    Ano e semestre das duas colunas são extraídos numa única passada da expressão regular,
+    direto para colunas inteiras (ANO_<periodo> e <periodo>, Int16 com <NA> onde ausentes) e para
+    o índice inteiro do semestre (INDICE_<periodo>, Int32).
+    As colunas textuais <periodo>_FORMATADO ('2014.1') só são geradas com incluir_texto=True.
     """
-    for periodo in ['PERIODO_EVASAO', 'PERIODO_INGRESSO']:
-        df_temp = pd.DataFrame(df[periodo].str.split('/', expand=True))
-        df_temp.columns = ['ANO', periodo]
-        df_temp[periodo] = df_temp[periodo].str.extract('(\d+)', expand=False)
-        df[f'{periodo}_FORMATADO'] = df_temp['ANO'] + '.' + df_temp[periodo]
-        df[periodo] = df_temp[periodo]
-        df[f'ANO_{periodo}'] = df_temp['ANO']
-
-    df['PERIODO_INGRESSO_FORMATADO'] = df['PERIODO_INGRESSO_FORMATADO'].fillna('0.0')
+    valores = pd.concat([df[periodo].astype('string') for periodo in COLUNAS_PERIODO], ignore_index=True)
+    partes = valores.str.extract(PADRAO_PERIODO)
+    anos = partes['ano'].astype('float64').to_numpy()
+    semestres = partes['semestre'].astype('float64').to_numpy()
+    invalidos = ~np.isnan(semestres) & ~np.isin(semestres, SEMESTRES_VALIDOS)
+    if invalidos.any():
+        print(f"Aviso: {invalidos.sum()} períodos com semestre fora de {SEMESTRES_VALIDOS} ficaram sem índice: "
+              f"{sorted(set(valores[invalidos].dropna()))[:10]}")
+
+    for posicao, periodo in enumerate(COLUNAS_PERIODO):
+        trecho = slice(posicao * len(df), (posicao + 1) * len(df))
+        if incluir_texto:
+            texto = partes['ano'].iloc[trecho] + '.' + partes['semestre'].iloc[trecho]
+            df[f'{periodo}_FORMATADO'] = texto.astype(object).where(texto.notna(), np.nan).to_numpy()
+        df[periodo] = pd.array(semestres[trecho], dtype='Int16')
+        df[f'ANO_{periodo}'] = pd.array(anos[trecho], dtype='Int16')
+        df[f'INDICE_{periodo}'] = periodo_para_indice(anos[trecho], semestres[trecho])
+
+    if incluir_texto:
+        df['PERIODO_INGRESSO_FORMATADO'] = df['PERIODO_INGRESSO_FORMATADO'].fillna('0.0')
     return df
 
 
-def calcular_idade_ingresso(row):
+def mes_inicio_semestre(semestre):
     """
-    Função para calcular a idade do aluno no momento do ingresso
+    Mês de início do semestre: janeiro para o 1º semestre e julho para os demais.
     """
-    if pd.isna(row['PERIODO_INGRESSO_FORMATADO']) or pd.isna(row['DT_NASCIMENTO']):
-        return np.nan
+    return np.where(semestre == 1, 1, 7)
 
-    try:
-        ano_ingresso, semestre_ingresso = map(int, row['PERIODO_INGRESSO_FORMATADO'].split('.'))
-        if ano_ingresso == 0 and semestre_ingresso == 0:
-            return np.nan
 
-        mes_ingresso = 1 if semestre_ingresso == 1 else 7
-        data_ingresso = pd.Timestamp(year=ano_ingresso, month=mes_ingresso, day=1)
-        idade_ingresso = data_ingresso.year - row['DT_NASCIMENTO'].year - (
-                (data_ingresso.month, data_ingresso.day) < (row['DT_NASCIMENTO'].month, row['DT_NASCIMENTO'].day))
-        return idade_ingresso
-    except (ValueError, TypeError):
-        return np.nan
+def ano_valido(ano):
+    """
+    Indica se o ano pode ser usado para montar uma data (entre 1 e 9999).
+    Anos como 0 (períodos preenchidos com '0.0') ficam de fora.
+    """
+    return (ano >= MINYEAR) & (ano <= MAXYEAR)
 
 
-def calcular_idade_evasao(row):
+def periodo_para_indice(ano, semestre):
     """
-    Função para calcular a idade do aluno no momento da evasão
+    Converte ano e semestre no índice inteiro do semestre: ano * 2 no 1º semestre e ano * 2 + 1
+    no 2º. Semestres consecutivos têm índices consecutivos, então ordenações, agrupamentos
+    e filtros por intervalo podem ser feitos direto sobre inteiros.
+    Aceita escalares (retorna int, ou <NA>) ou arrays/séries (retorna um array Int32, com <NA> para
+    períodos ausentes, com ano inválido ou com semestre fora de SEMESTRES_VALIDOS, como 0 ou 3).
     """
-    if pd.isna(row['PERIODO_EVASAO_FORMATADO']) or pd.isna(row['DT_NASCIMENTO']):
-        return np.nan
+    if np.ndim(ano) == 0 and np.ndim(semestre) == 0:
+        if semestre not in SEMESTRES_VALIDOS:
+            return pd.NA
+        return int(ano) * 2 + int(semestre) - 1
 
-    try:
-        ano_evasao, semestre_evasao = map(int, row['PERIODO_EVASAO_FORMATADO'].split('.'))
-        if ano_evasao == 0:
-            return np.nan
+    ano = np.asarray(pd.to_numeric(ano, errors='coerce'), dtype=float)
+    semestre = np.asarray(pd.to_numeric(semestre, errors='coerce'), dtype=float)
+    with np.errstate(invalid='ignore'):
+        valido = np.isin(semestre, SEMESTRES_VALIDOS) & ano_valido(ano)
+    indice = np.where(valido, ano * 2 + (semestre - 1), 0).astype('int32')
+    return pd.arrays.IntegerArray(indice, ~valido)
 
-        mes_evasao = 1 if semestre_evasao == 1 else 7
-        data_evasao = pd.Timestamp(year=ano_evasao, month=mes_evasao, day=1)
-        idade_evasao = data_evasao.year - row['DT_NASCIMENTO'].year - (
-                (data_evasao.month, data_evasao.day) < (row['DT_NASCIMENTO'].month, row['DT_NASCIMENTO'].day))
-        return idade_evasao
-    except (ValueError, TypeError):
-        return np.nan
 
+def indice_para_periodo(indice):
+    """
+    Converte índices de semestre de volta em (ano, semestre).
+    Para arrays/séries retorna dois arrays float, com NaN onde o índice é <NA>.
+    """
+    if np.ndim(indice) == 0:
+        ano, metade = divmod(int(indice), 2)
+        return ano, metade + 1
 
-def classificar_idade(df):
+    indice = pd.array(indice, dtype='Int64').to_numpy(dtype=float, na_value=np.nan)
+    ano = np.floor(indice / 2)
+    return ano, indice - ano * 2 + 1
+
+
+def indice_para_texto(indice):
     """
-    Função para classificar a idade dos alunos no ingresso e evasão.
+    Converte índices de semestre no formato textual 'AAAA.S' (NaN onde o índice é <NA>).
     """
-    # Calcula a idade de ingresso
-    df['IDADE_INGRESSO'] = df.apply(calcular_idade_ingresso, axis=1)
+    ano, semestre = indice_para_periodo(indice)
+    if np.ndim(indice) == 0:
+        return f'{ano}.{semestre}'
 
-    # Calcula a idade na evasão, se houver
-    df['IDADE_EVASAO'] = df.apply(calcular_idade_evasao, axis=1)
+    texto = pd.Series(ano).astype('Int64').astype(str) + '.' + pd.Series(semestre).astype('Int64').astype(str)
+    return texto.where(~np.isnan(ano), np.nan).to_numpy(dtype=object)
 
-    return df
 
+def obter_indice_periodo(df, periodo='PERIODO_INGRESSO'):
+    """
+    Retorna a coluna INDICE_<periodo> do DataFrame. Para arquivos processados antes da
+    criação do índice, calcula-o a partir das colunas ANO_<periodo> e <periodo>.
+    """
+    coluna = f'INDICE_{periodo}'
+    if coluna in df.columns:
+        return df[coluna]
+    return pd.Series(periodo_para_indice(df[f'ANO_{periodo}'], df[periodo]), index=df.index, name=coluna)
 
-def calcular_tempo_curso(df):
+
+def obter_ano_semestre(df, periodo='PERIODO_INGRESSO'):
     """
-    Função para calcular o tempo de curso dos alunos que concluíram.
+    Retorna ano e semestre do período como arrays float (NaN quando ausentes), lidos direto das
+    colunas ANO_<periodo> e <periodo>. Diferente do índice, semestres fora de SEMESTRES_VALIDOS
+    são mantidos, para que idade e tempo de curso continuem sendo calculados para eles.
     """
+    return df[f'ANO_{periodo}'].astype('float64').to_numpy(), df[periodo].astype('float64').to_numpy()
 
-    def calcular_tempo(row):
-        if pd.isna(row['PERIODO_INGRESSO_FORMATADO']) or pd.isna(row['PERIODO_EVASAO_FORMATADO']):
-            return np.nan
-        try:
-            ano_ingresso, semestre_ingresso = map(int, row['PERIODO_INGRESSO_FORMATADO'].split('.'))
-            ano_evasao, semestre_evasao = map(int, row['PERIODO_EVASAO_FORMATADO'].split('.'))
 
-            mes_ingresso = 1 if semestre_ingresso == 1 else 7
-            mes_evasao = 1 if semestre_evasao == 1 else 7
+def calcular_idade_no_periodo(ano, semestre, nascimento):
+    """
+    Calcula, de forma vetorizada, a idade no primeiro dia do semestre informado.
+    :param ano: Array com o ano do período (float, NaN quando ausente).
+    :param semestre: Array com o semestre do período (float, NaN quando ausente).
+    :param nascimento: Série datetime com as datas de nascimento.
+    :return: Array float com as idades (NaN quando não é possível calcular).
+    """
+    ano_nascimento = nascimento.dt.year.to_numpy(dtype=float)
+    mes_nascimento = nascimento.dt.month.to_numpy(dtype=float)
+    dia_nascimento = nascimento.dt.day.to_numpy(dtype=float)
+
+    mes = mes_inicio_semestre(semestre)
+    valido = ~np.isnan(ano) & ~np.isnan(semestre) & ~np.isnan(ano_nascimento)
+    with np.errstate(invalid='ignore'):
+        valido &= ano_valido(ano)
 
-            data_ingresso = pd.Timestamp(year=ano_ingresso, month=mes_ingresso, day=1)
-            data_evasao = pd.Timestamp(year=ano_evasao, month=mes_evasao, day=1)
+    # A data de referência é sempre o dia 1, então o aniversário ainda não chegou
+    # se o mês de nascimento for posterior, ou o mesmo mês com dia maior que 1
+    aniversario_pendente = (mes < mes_nascimento) | ((mes == mes_nascimento) & (dia_nascimento > 1))
+    idade = ano - ano_nascimento - aniversario_pendente
+    return np.where(valido, idade, np.nan)
 
-            tempo_curso = (data_evasao - data_ingresso).days / 365.25  # Calcula o tempo de curso em anos
-            return round(tempo_curso, 2)  # Arredonda para 2 casas decimais
-        except (ValueError, TypeError):
-            return np.nan
 
-    df['TEMPO_CURSO'] = df.apply(calcular_tempo, axis=1)
+def classificar_idade(df):
+    """
+    Função para classificar a idade dos alunos no ingresso e evasão.
+    """
+    # Calcula a idade de ingresso
+    ano_ingresso, semestre_ingresso = obter_ano_semestre(df, 'PERIODO_INGRESSO')
+    df['IDADE_INGRESSO'] = calcular_idade_no_periodo(ano_ingresso, semestre_ingresso, df['DT_NASCIMENTO'])
+
+    # Calcula a idade na evasão, se houver
+    ano_evasao, semestre_evasao = obter_ano_semestre(df, 'PERIODO_EVASAO')
+    df['IDADE_EVASAO'] = calcular_idade_no_periodo(ano_evasao, semestre_evasao, df['DT_NASCIMENTO'])
+
     return df
 
 
-def extrair_data_ingresso(row):
+def inicio_semestre(ano, semestre):
+    """
+    Calcula, de forma vetorizada, o primeiro dia de cada semestre como datetime64[D].
+    Períodos ausentes ou com ano inválido viram NaT.
     """
-    Função para extrair a data de ingresso do aluno
+    with np.errstate(invalid='ignore'):
+        valido = ~np.isnan(semestre) & ano_valido(ano)
+    meses = np.where(valido, (ano - 1970) * 12 + mes_inicio_semestre(semestre) - 1, 0).astype('int64')
+    datas = meses.astype('datetime64[M]').astype('datetime64[D]')
+    return np.where(valido, datas, np.datetime64('NaT'))
+
+
+def calcular_tempo_curso(df):
     """
-    ano_ingresso, semestre_ingresso = map(int, row['PERIODO_INGRESSO_FORMATADO'].split('.'))
-    mes_ingresso = 1 if semestre_ingresso == 1 else 7
-    return pd.Timestamp(year=ano_ingresso, month=mes_ingresso, day=1)
+    Função para calcular o tempo de curso dos alunos que concluíram.
+    """
+    data_ingresso = inicio_semestre(*obter_ano_semestre(df, 'PERIODO_INGRESSO'))
+    data_evasao = inicio_semestre(*obter_ano_semestre(df, 'PERIODO_EVASAO'))
+
+    # Calcula o tempo de curso em anos, arredondado para 2 casas decimais
+    dias = (data_evasao - data_ingresso) / np.timedelta64(1, 'D')
+    df['TEMPO_CURSO'] = np.round(dias / 365.25, 2)
+    return df
 
 
 def remover_alunos_anteriores_2014(df):
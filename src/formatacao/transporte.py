@@ -0,0 +1,123 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from colorama import Fore, Style
+from scipy.spatial import cKDTree
+
+from src.formatacao.centroides import RAIO_TERRA_KM
+from src.utils.cache_ingestao import calcular_hash_arquivo
+from src.utils.utils import pega_caminho_base
+
+CAMINHO_PARADAS_GTFS = os.path.join('dados', 'gtfs', 'stops.txt')
+PASTA_CACHE_GTFS = os.path.join('dados', 'cache', 'gtfs')
+VERSAO_CACHE_GTFS = 1
+
+# Raio, em quilômetros, usado para contar as estações próximas de cada aluno
+RAIO_ESTACOES_KM = 1.0
+
+# location_type do GTFS que identifica estações (agrupadoras de paradas)
+TIPO_ESTACAO = 1
+
+
+def coordenadas_cartesianas(latitude, longitude):
+    """
+    Converte latitude e longitude em pontos da esfera unitária, para que a distância euclidiana
+    da árvore (corda) seja equivalente à distância sobre a superfície.
+    """
+    latitude = np.radians(np.asarray(latitude, dtype=float))
+    longitude = np.radians(np.asarray(longitude, dtype=float))
+    return np.column_stack((np.cos(latitude) * np.cos(longitude),
+                            np.cos(latitude) * np.sin(longitude),
+                            np.sin(latitude)))
+
+
+def km_para_corda(distancia_km):
+    return 2 * np.sin(np.asarray(distancia_km, dtype=float) / (2 * RAIO_TERRA_KM))
+
+
+def corda_para_km(corda):
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.clip(np.asarray(corda, dtype=float) / 2, 0, 1))
+
+
+def carregar_paradas(caminho=CAMINHO_PARADAS_GTFS):
+    """
+    Lê o stops.txt de um feed GTFS local. Se o feed tiver estações (location_type = 1), apenas elas
+    são consideradas; caso contrário, todas as paradas.
+    :param caminho: Caminho do stops.txt, relativo à raiz do projeto.
+    :return: DataFrame com as colunas stop_id, stop_name, stop_lat e stop_lon.
+    """
+    paradas = pd.read_csv(os.path.join(pega_caminho_base(), caminho), dtype={'stop_id': str})
+    paradas = paradas.dropna(subset=['stop_lat', 'stop_lon'])
+    if 'location_type' in paradas.columns:
+        estacoes = paradas[pd.to_numeric(paradas['location_type'], errors='coerce') == TIPO_ESTACAO]
+        if not estacoes.empty:
+            paradas = estacoes
+    return paradas[['stop_id', 'stop_name', 'stop_lat', 'stop_lon']].reset_index(drop=True)
+
+
+def carregar_arvore_paradas(caminho=CAMINHO_PARADAS_GTFS, pasta_cache=PASTA_CACHE_GTFS):
+    """
+    Monta a KD-tree das estações do feed GTFS, reaproveitando a versão salva em disco enquanto
+    o stops.txt não mudar.
+    :param caminho: Caminho do stops.txt, relativo à raiz do projeto.
+    :param pasta_cache: Pasta do cache da árvore, relativa à raiz do projeto.
+    :return: Tupla (cKDTree, nomes das estações) ou None, se o arquivo não existir.
+    """
+    caminho_completo = os.path.join(pega_caminho_base(), caminho)
+    if not os.path.exists(caminho_completo):
+        print(Fore.YELLOW + f"Feed GTFS não encontrado: {caminho_completo}" + Style.RESET_ALL)
+        return None
+
+    pasta = os.path.join(pega_caminho_base(), pasta_cache)
+    caminho_cache = os.path.join(pasta, f'arvore_paradas__v{VERSAO_CACHE_GTFS}__{calcular_hash_arquivo(caminho_completo)}.pkl')
+    if os.path.exists(caminho_cache):
+        with open(caminho_cache, 'rb') as arquivo:
+            return pickle.load(arquivo)
+
+    paradas = carregar_paradas(caminho)
+    arvore = cKDTree(coordenadas_cartesianas(paradas['stop_lat'], paradas['stop_lon']))
+    resultado = (arvore, paradas['stop_name'].to_numpy(dtype=object))
+
+    os.makedirs(pasta, exist_ok=True)
+    for antigo in os.listdir(pasta):
+        if antigo.startswith('arvore_paradas__'):
+            os.remove(os.path.join(pasta, antigo))
+    temporario = caminho_cache + '.tmp'
+    with open(temporario, 'wb') as arquivo:
+        pickle.dump(resultado, arquivo)
+    os.replace(temporario, caminho_cache)
+    return resultado
+
+
+def adicionar_distancia_transporte(dataframe, caminho=CAMINHO_PARADAS_GTFS, raio_km=RAIO_ESTACOES_KM, arvore=None):
+    """
+    Adiciona a distância até a estação de transporte mais próxima (DISTANCIA_ESTACAO, em km),
+    o nome dessa estação (ESTACAO_MAIS_PROXIMA) e a quantidade de estações a até `raio_km`
+    (ESTACOES_NO_RAIO), a partir das colunas LATITUDE e LONGITUDE.
+    Alunos sem coordenadas, ou sem feed GTFS disponível, ficam com valores nulos.
+    :param dataframe: DataFrame com as colunas LATITUDE e LONGITUDE.
+    :param caminho: Caminho do stops.txt, relativo à raiz do projeto.
+    :param raio_km: Raio, em quilômetros, para a contagem de estações.
+    :param arvore: Tupla (cKDTree, nomes) já carregada (padrão: carregar_arvore_paradas(caminho)).
+    :return: DataFrame com as novas colunas.
+    """
+    dataframe['DISTANCIA_ESTACAO'] = np.nan
+    dataframe['ESTACAO_MAIS_PROXIMA'] = None
+    dataframe['ESTACOES_NO_RAIO'] = pd.array([pd.NA] * len(dataframe), dtype='Int32')
+
+    arvore = carregar_arvore_paradas(caminho) if arvore is None else arvore
+    com_coordenadas = dataframe['LATITUDE'].notna() & dataframe['LONGITUDE'].notna()
+    if arvore is None or not com_coordenadas.any():
+        return dataframe
+
+    arvore, nomes = arvore
+    pontos = coordenadas_cartesianas(dataframe.loc[com_coordenadas, 'LATITUDE'], dataframe.loc[com_coordenadas, 'LONGITUDE'])
+    cordas, posicoes = arvore.query(pontos)
+    quantidades = arvore.query_ball_point(pontos, km_para_corda(raio_km), return_length=True)
+
+    dataframe.loc[com_coordenadas, 'DISTANCIA_ESTACAO'] = np.round(corda_para_km(cordas), 2)
+    dataframe.loc[com_coordenadas, 'ESTACAO_MAIS_PROXIMA'] = nomes[posicoes]
+    dataframe.loc[com_coordenadas, 'ESTACOES_NO_RAIO'] = quantidades
+    print(Fore.GREEN + f"Estação mais próxima calculada para {com_coordenadas.sum()} de {len(dataframe)} registros." + Style.RESET_ALL)
+    return dataframe
@@ -116,3 +116,56 @@ regiao_campos = ['Campos dos Goytacazes', 'Cardoso Moreira', 'São Fidélis', 'S
 regiao_dos_lagos = ['Cabo Frio', 'Arraial do Cabo', 'Araruama', 'Saquarema', 'Iguaba Grande',
                     'São Pedro da Aldeia', 'Maricá', 'Rio das Ostras', 'Armacao dos Buzios', 'Casimiro de Abreu',
                     'Conceição de Macabu', 'Quissamã', 'Macaé', 'Carapebus']
+
+# Nomes (normalizados) dos polígonos do Limite_de_Bairros.geojson que não existem nas listas de zonas.
+# A Freguesia da Ilha do Governador entra como 'ilha do governador', nome já usado nos endereços digitados
+correcoes_bairros_poligonos = {
+    'freguesia': ['freguesia (jacarepagua)'],
+    'ilha do governador': ['freguesia (ilha)'],
+    'sao cristovao': ['bairro imperial de sao cristovao'],
+}
+
+# Coordenadas (latitude, longitude) aproximadas da sede dos municípios fora da capital, usadas no
+# cálculo offline de distâncias para alunos de outras cidades
+centroides_municipios = {
+    # Baixada Fluminense
+    'Nova Iguaçu': (-22.7592, -43.4511), 'Duque de Caxias': (-22.7856, -43.3117),
+    'Belford Roxo': (-22.7641, -43.3995), 'São João de Meriti': (-22.8039, -43.3722),
+    'Nilópolis': (-22.8076, -43.4141), 'Mesquita': (-22.7830, -43.4316), 'Magé': (-22.6532, -43.0405),
+    'Queimados': (-22.7155, -43.5553), 'Itaguaí': (-22.8522, -43.7753), 'Japeri': (-22.6434, -43.6533),
+    'Guapimirim': (-22.5373, -42.9818), 'Paracambi': (-22.6107, -43.7094), 'Seropédica': (-22.7441, -43.7077),
+    'Tanguá': (-22.7305, -42.7202),
+    # Niterói/São Gonçalo
+    'Niterói': (-22.8832, -43.1034), 'São Gonçalo': (-22.8268, -43.0634), 'Itaboraí': (-22.7444, -42.8597),
+    # Região Serrana
+    'Bom Jardim': (-22.1519, -42.4195), 'Cantagalo': (-21.9811, -42.3681), 'Carmo': (-21.9310, -42.6046),
+    'Cordeiro': (-22.0289, -42.3610), 'Duas Barras': (-22.0536, -42.5232), 'Macuco': (-21.9813, -42.2533),
+    'Nova Friburgo': (-22.2819, -42.5311), 'Petrópolis': (-22.5050, -43.1786),
+    'São José do Vale do Rio Preto': (-22.1525, -42.9243), 'São Sebastião do Alto': (-21.9578, -42.1328),
+    'Santa Maria Madalena': (-21.9547, -42.0098), 'Sumidouro': (-22.0485, -42.6761),
+    'Teresópolis': (-22.4165, -42.9752), 'Trajano de Morais': (-22.0638, -42.0643), 'Areal': (-22.2283, -43.1118),
+    'Comendador Levy Gasparian': (-22.0404, -43.2140), 'Paraiba do Sul': (-22.1585, -43.2932),
+    'Sapucaia': (-21.9949, -42.9142), 'Três Rios': (-22.1165, -43.2092),
+    # Região de Volta Redonda
+    'Valença': (-22.2445, -43.7129), 'Vassouras': (-22.4059, -43.6686), 'Miguel Pereira': (-22.4572, -43.4803),
+    'Paty do Alferes': (-22.4309, -43.4285), 'Rio das Flores': (-22.1692, -43.5856),
+    'Barra do Piraí': (-22.4715, -43.8269), 'Piraí': (-22.6215, -43.8981), 'Pinheiral': (-22.5172, -44.0022),
+    'Volta Redonda': (-22.5202, -44.0996), 'Barra Mansa': (-22.5481, -44.1752), 'Resende': (-22.4705, -44.4509),
+    'Itatiaia': (-22.4897, -44.5675), 'Quatis': (-22.4045, -44.2597), 'Porto Real': (-22.4175, -44.2952),
+    'Rio Claro': (-22.7200, -44.1419),
+    # Região de Campos
+    'Campos dos Goytacazes': (-21.7622, -41.3181), 'Cardoso Moreira': (-21.4846, -41.6165),
+    'São Fidélis': (-21.6551, -41.7562), 'São Francisco de Itabapoana': (-21.4702, -41.1091),
+    'São João da Barra': (-21.6378, -41.0511), 'Bom Jesus do Itabapoana': (-21.1449, -41.6822),
+    'Itaperuna': (-21.1997, -41.8799), 'Laje do Muriaé': (-21.2091, -42.1271), 'Natividade': (-21.0390, -41.9697),
+    'Porciúncula': (-20.9632, -42.0465), 'Sao Jose de Ubá': (-21.3661, -41.9511), 'Varre-Sai': (-20.9276, -41.8701),
+    'Cambuci': (-21.5691, -41.9187), 'Italva': (-21.4296, -41.6914), 'Itaocara': (-21.6748, -42.0758),
+    'Miracema': (-21.4148, -42.1938), 'Santo Antônio de Pádua': (-21.5410, -42.1832),
+    # Região dos Lagos
+    'Cabo Frio': (-22.8894, -42.0286), 'Arraial do Cabo': (-22.9661, -42.0278), 'Araruama': (-22.8697, -42.3326),
+    'Saquarema': (-22.9292, -42.5099), 'Iguaba Grande': (-22.8495, -42.2299),
+    'São Pedro da Aldeia': (-22.8429, -42.1026), 'Maricá': (-22.9194, -42.8186),
+    'Rio das Ostras': (-22.5174, -41.9475), 'Armacao dos Buzios': (-22.7469, -41.8817),
+    'Casimiro de Abreu': (-22.4812, -42.2066), 'Conceição de Macabu': (-22.0834, -41.8687),
+    'Quissamã': (-22.1031, -41.4693), 'Macaé': (-22.3768, -41.7848), 'Carapebus': (-22.1821, -41.6630),
+}
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -27,20 +28,13 @@ class AnaliseTipoIngresso:
         Categoriza os períodos de ingresso em "Pré-Cota", "Pós-Cota", "Pandemia" e "Pós-Pandemia" na ordem correta.
         """
 
-        def definir_categoria(periodo):
-            if periodo <= 2013:
-                return "Pré-Cota"
-            elif 2014 <= periodo <= 2020:
-                return "Pós-Cota"
-            elif 2020.2 <= periodo <= 2022.2:
-                return "Pandemia"
-            else:
-                return "Pós-Pandemia"
-
-        self.df["PERIODO_CATEGORIZADO"] = self.df["ANO_PERIODO_INGRESSO"].apply(definir_categoria)
+        # Os limites são comparados sobre o ano de ingresso; alunos sem ano de ingresso ficam sem categoria
+        ano = self.df['ANO_PERIODO_INGRESSO'].astype('float').to_numpy()
+        condicoes = [ano < 2014, ano < 2021, ano < 2023, ano >= 2023]
 
         # Definir a ordem correta dos períodos
         categorias_ordenadas = ["Pré-Cota", "Pós-Cota", "Pandemia", "Pós-Pandemia"]
+        self.df["PERIODO_CATEGORIZADO"] = np.select(condicoes, categorias_ordenadas, default=None)
         self.df["PERIODO_CATEGORIZADO"] = pd.Categorical(
             self.df["PERIODO_CATEGORIZADO"], categories=categorias_ordenadas, ordered=True
         )
@@ -116,9 +110,9 @@ class AnaliseTipoIngresso:
             print(Fore.YELLOW + "Plotando gráfico de distribuição geral dos tipos de ingresso..." + Style.RESET_ALL)
 
             # Criar a nova categoria de ingresso agrupando 2008-2013 como "Ampla Concorrência - Antes das Cotas"
-            self.df["CATEGORIA_INGRESSO"] = self.df.apply(
-                lambda row: "Ampla Concorrência - Antes das Cotas" if row["ANO_PERIODO_INGRESSO"] <= 2013 else row["FORMA_INGRESSO"],
-                axis=1
+            antes_das_cotas = self.df["ANO_PERIODO_INGRESSO"].astype('float') < 2014
+            self.df["CATEGORIA_INGRESSO"] = self.df["FORMA_INGRESSO"].where(
+                ~antes_das_cotas, "Ampla Concorrência - Antes das Cotas"
             )
 
             # Contagem de alunos por tipo de ingresso
@@ -15,18 +15,7 @@ from src.utils.utils import (
     remover_acentos_e_maiusculas,
     pega_caminho_base
 )
-from src.formatacao.zonas_geograficas import (
-    zona_norte,
-    zona_oeste,
-    zona_sul,
-    bairros_centro,
-    baixada_fluminense,
-    regiao_volta_redonda,
-    niteroi_sao_goncalo,
-    regiao_serrana,
-    regiao_campos,
-    regiao_dos_lagos
-)
+from src.formatacao.localizacao import classificador_zonas
 
 # Inicializa o Colorama
 from colorama import init
@@ -112,12 +101,15 @@ class AnaliseGeografica:
                     print(Fore.RED + f"Sem dados de alunos para o período: {periodo_nome}" + Style.RESET_ALL)
                     continue
 
+                # Categorização da Zona Geográfica: reaproveita a coluna ZONA gerada na formatação
+                if 'ZONA' in df_periodo.columns:
+                    df_periodo['ZONA_GEOGRAFICA'] = df_periodo['ZONA']
+                else:
+                    df_periodo['ZONA_GEOGRAFICA'] = classificador_zonas.classificar_dataframe(df_periodo)
+
                 # Normaliza os nomes dos bairros
                 df_periodo['BAIRRO'] = df_periodo['BAIRRO'].apply(remover_acentos_e_maiusculas)
 
-                # Categorização da Zona Geográfica
-                df_periodo['ZONA_GEOGRAFICA'] = df_periodo['BAIRRO'].apply(self.categorizar_zona)
-
                 # Adiciona o nome do período
                 df_periodo['Período'] = periodo_nome
 
@@ -137,34 +129,12 @@ class AnaliseGeografica:
 
     def categorizar_zona(self, bairro):
         """
-        Categoriza o bairro em uma zona geográfica predefinida.
+        Categoriza um bairro da cidade do Rio de Janeiro em uma zona geográfica predefinida.
 
         :param bairro: Nome do bairro.
         :return: Nome da zona geográfica.
         """
-        bairro_normalizado = remover_acentos_e_maiusculas(bairro)
-        if bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in zona_norte]:
-            return 'Zona Norte'
-        elif bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in zona_oeste]:
-            return 'Zona Oeste'
-        elif bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in zona_sul]:
-            return 'Zona Sul'
-        elif bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in bairros_centro]:
-            return 'Centro'
-        elif bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in baixada_fluminense]:
-            return 'Baixada Fluminense'
-        elif bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in regiao_volta_redonda]:
-            return 'Região Volta Redonda'
-        elif bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in niteroi_sao_goncalo]:
-            return 'Niterói/São Gonçalo'
-        elif bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in regiao_serrana]:
-            return 'Região Serrana'
-        elif bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in regiao_campos]:
-            return 'Região Campos'
-        elif bairro_normalizado in [remover_acentos_e_maiusculas(b) for b in regiao_dos_lagos]:
-            return 'Região dos Lagos'
-        else:
-            return 'Fora do Estado'
+        return classificador_zonas.classificar(bairro, 'rio de janeiro', 'rio de janeiro')
 
     # -----------------------------------
     # Métodos de Plotagem Geográfica Unificados
@@ -263,11 +233,12 @@ class AnaliseGeografica:
         except Exception as e:
             print(Fore.RED + f"Ocorreu um erro inesperado em plot_distribuicao_alunos_por_zona_unificada: {e}" + Style.RESET_ALL)
 
-    def plot_correlacao_cra_alunos_concluintes(self, df_unificado):
+    def plot_correlacao_cra_alunos_concluintes(self, df_unificado, coluna_distancia='DISTANCIA_URCA'):
         """
-        Plota a correlação entre CRA e outra variável relevante para alunos que concluíram a faculdade.
+        Plota a correlação entre CRA e a distância até um ponto de referência para alunos que concluíram a faculdade.
 
         :param df_unificado: DataFrame consolidado com todos os períodos.
+        :param coluna_distancia: Coluna de distância usada no eixo X (ex: 'DISTANCIA_URCA', 'DISTANCIA_CENTRAL_DO_BRASIL').
         """
         try:
             print(Fore.YELLOW + "Plotando Correlação do CRA dos Alunos que Concluíram a Faculdade..." + Style.RESET_ALL)
@@ -279,16 +250,17 @@ class AnaliseGeografica:
                 print(Fore.RED + "Nenhum dado disponível para alunos concluintes." + Style.RESET_ALL)
                 return
 
-            # Supondo que exista uma coluna 'DISTANCIA_URCA' para correlacionar com CRA
-            if 'DISTANCIA_URCA' not in df_concluintes.columns:
-                print(Fore.RED + "A coluna 'DISTANCIA_URCA' não está presente no DataFrame." + Style.RESET_ALL)
+            if coluna_distancia not in df_concluintes.columns:
+                print(Fore.RED + f"A coluna '{coluna_distancia}' não está presente no DataFrame." + Style.RESET_ALL)
                 return
 
+            referencia = coluna_distancia.replace('DISTANCIA_', '', 1).replace('_', ' ').title()
+
             plt.figure(figsize=(14, 10))
             sns.set(style="whitegrid")
 
             ax = sns.scatterplot(
-                x='DISTANCIA_URCA',
+                x=coluna_distancia,
                 y='CRA',
                 hue='Período',
                 data=df_concluintes,
@@ -297,21 +269,22 @@ class AnaliseGeografica:
             )
 
             # Calcular e exibir a correlação
-            correlacao = df_concluintes[['DISTANCIA_URCA', 'CRA']].corr().iloc[0, 1]
+            correlacao = df_concluintes[[coluna_distancia, 'CRA']].corr().iloc[0, 1]
             plt.annotate(f'Correlação: {correlacao:.2f}', xy=(0.05, 0.95), xycoords='axes fraction',
                          fontsize=14, color='black', backgroundcolor='white')
 
             ajustar_estilos_grafico(
                 ax,
-                title='Correlação entre Distância da Urca e CRA dos Alunos Concluintes - Unificado por Período',
-                xlabel='Distância até a Urca (km)',
+                title=f'Correlação entre Distância até {referencia} e CRA dos Alunos Concluintes - Unificado por Período',
+                xlabel=f'Distância até {referencia} (km)',
                 ylabel='CRA'
             )
 
             plt.legend(title='Período Temporal', bbox_to_anchor=(1.05, 1), loc='upper left')
             plt.tight_layout()
 
-            salvar_grafico('correlacao_cra_alunos_concluintes_unificado', self.nome_pasta)
+            sufixo = '' if coluna_distancia == 'DISTANCIA_URCA' else f'_{coluna_distancia.lower()}'
+            salvar_grafico(f'correlacao_cra_alunos_concluintes_unificado{sufixo}', self.nome_pasta)
             plt.close()
             print(Fore.CYAN + "Gráfico de Correlação do CRA dos Alunos Concluintes (Unificado) salvo com sucesso." + Style.RESET_ALL)
         except Exception as e:
@@ -0,0 +1,95 @@
+import glob
+import hashlib
+import os
+import re
+import pandas as pd
+from colorama import Fore, Style
+
+from src.utils.utils import pega_caminho_base, restaurar_nulos_texto
+
+PASTA_CACHE_INGESTAO = os.path.join('dados', 'cache', 'ingestao')
+VERSAO_CACHE = 1
+
+
+def calcular_hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """
+    Calcula o hash SHA-256 do conteúdo de um arquivo, lendo-o em blocos.
+    :param caminho: Caminho do arquivo.
+    :param tamanho_bloco: Tamanho de cada bloco lido, em bytes.
+    :return: Hash hexadecimal do conteúdo.
+    """
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _prefixo_entrada(caminho, planilha):
+    """
+    Monta o prefixo dos arquivos de cache de uma planilha/aba.
+    """
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    return re.sub(r'[^\w.-]', '_', f'{nome}__{planilha}')
+
+
+def _pasta_cache(pasta_cache=None):
+    return os.path.join(pega_caminho_base(), pasta_cache or PASTA_CACHE_INGESTAO)
+
+
+def ler_excel_com_cache(caminho, planilha=0, pasta_cache=None):
+    """
+    Lê uma planilha Excel usando um cache endereçado pelo conteúdo do arquivo.
+    A chave do cache é o hash do arquivo mais o nome da aba; se o arquivo não mudou,
+    o DataFrame decodificado é lido do Parquet sem passar pelo openpyxl.
+    :param caminho: Caminho da planilha.
+    :param planilha: Nome ou índice da aba (mesmo significado do sheet_name do pandas).
+    :param pasta_cache: Pasta do cache, relativa à raiz do projeto (opcional).
+    :return: Tupla (DataFrame, status), onde status é 'hit' ou 'miss'.
+    """
+    pasta = _pasta_cache(pasta_cache)
+    prefixo = _prefixo_entrada(caminho, planilha)
+    chave = calcular_hash_arquivo(caminho)
+    caminho_cache = os.path.join(pasta, f'{prefixo}__v{VERSAO_CACHE}__{chave}.parquet')
+
+    if os.path.exists(caminho_cache):
+        return restaurar_nulos_texto(pd.read_parquet(caminho_cache)), 'hit'
+
+    df = pd.read_excel(caminho, sheet_name=planilha)
+
+    # Remove entradas antigas da mesma planilha/aba, que correspondem a versões anteriores do arquivo
+    invalidar_cache_ingestao(caminho, planilha, pasta_cache)
+    os.makedirs(pasta, exist_ok=True)
+    caminho_temporario = caminho_cache + '.tmp'
+    try:
+        df.to_parquet(caminho_temporario, index=False, engine='pyarrow')
+        os.replace(caminho_temporario, caminho_cache)
+    except Exception as e:
+        # Colunas com tipos mistos não são representáveis em Parquet; a leitura segue sem cache
+        print(Fore.YELLOW + f"Não foi possível gravar o cache de ingestão: {e}" + Style.RESET_ALL)
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+    return df, 'miss'
+
+
+def invalidar_cache_ingestao(caminho=None, planilha=None, pasta_cache=None):
+    """
+    Remove entradas do cache de ingestão.
+    :param caminho: Planilha cujas entradas serão removidas (todas, se não informado).
+    :param planilha: Aba específica a invalidar (todas as abas da planilha, se não informado).
+    :param pasta_cache: Pasta do cache, relativa à raiz do projeto (opcional).
+    :return: Quantidade de entradas removidas.
+    """
+    pasta = _pasta_cache(pasta_cache)
+    if caminho is None:
+        padrao = '*.parquet'
+    elif planilha is None:
+        padrao = glob.escape(_prefixo_entrada(caminho, '')) + '*.parquet'
+    else:
+        padrao = glob.escape(_prefixo_entrada(caminho, planilha)) + '__*.parquet'
+
+    removidos = 0
+    for arquivo in glob.glob(os.path.join(pasta, padrao)):
+        os.remove(arquivo)
+        removidos += 1
+    return removidos
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from cryptography.fernet import Fernet
+
+# O cofre fica ao lado da chave, fora da pasta de dados usada pelas análises
+CAMINHO_COFRE = os.path.join(sys.path[0], "cofre_tokens.sqlite")
+
+# Limite de parâmetros por consulta do SQLite (SQLITE_MAX_VARIABLE_NUMBER das versões antigas)
+TAMANHO_LOTE_CONSULTA = 900
+
+
+class CofreTokens:
+    def __init__(self, chave: bytes, caminho: str = CAMINHO_COFRE):
+        """
+        Cofre local de reidentificação: token -> identificador original. Os originais são gravados
+        criptografados com a chave Fernet (chave.key), então o arquivo sozinho não revela nada.
+        O token é a chave primária da tabela, e cada consulta é uma busca na árvore B do índice.
+        Deve ser usado apenas no acompanhamento autorizado; as análises só recebem os tokens.
+
+        :param chave: Conteúdo do chave.key.
+        :param caminho: Caminho do banco SQLite.
+        """
+        self.fernet = Fernet(chave)
+        self.caminho = caminho
+        self.conexao = sqlite3.connect(self.caminho)
+        self.conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tokens (
+                token TEXT PRIMARY KEY,
+                coluna TEXT NOT NULL,
+                original BLOB NOT NULL,
+                criado_em TEXT NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self.conexao.commit()
+
+    def registrar_varios(self, registros):
+        """
+        Grava vários tokens em uma única transação. Tokens já registrados são mantidos.
+        :param registros: Lista de tuplas (token, coluna, original).
+        """
+        criado_em = datetime.now().isoformat(timespec='seconds')
+        with self.conexao:
+            self.conexao.executemany(
+                "INSERT OR IGNORE INTO tokens (token, coluna, original, criado_em) VALUES (?, ?, ?, ?)",
+                [(token, coluna, self.fernet.encrypt(str(original).encode()), criado_em)
+                 for token, coluna, original in registros]
+            )
+
+    def reidentificar(self, token):
+        """
+        Consulta um token.
+        :return: Identificador original, ou None se o token não estiver no cofre.
+        """
+        return self.reidentificar_varios([token]).get(token)
+
+    def reidentificar_varios(self, tokens):
+        """
+        Consulta vários tokens de uma vez, em lotes de TAMANHO_LOTE_CONSULTA.
+        :param tokens: Lista de tokens (duplicados são consultados uma vez).
+        :return: Dicionário token -> identificador original, apenas para os tokens encontrados.
+        """
+        tokens = list(dict.fromkeys(tokens))
+        resultados = {}
+        for inicio in range(0, len(tokens), TAMANHO_LOTE_CONSULTA):
+            lote = tokens[inicio:inicio + TAMANHO_LOTE_CONSULTA]
+            linhas = self.conexao.execute(
+                f"SELECT token, original FROM tokens WHERE token IN ({', '.join('?' * len(lote))})", lote
+            )
+            resultados.update((token, self.fernet.decrypt(original).decode()) for token, original in linhas)
+        return resultados
+
+    def __len__(self):
+        return self.conexao.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+
+    def fechar(self):
+        self.conexao.close()
+
+
+def main():
+    print("Reidentificação de tokens")
+    tokens = [token.strip() for token in input("Digite os tokens separados por vírgula: ").split(',') if token.strip()]
+    with open(os.path.join(sys.path[0], "chave.key"), 'rb') as arquivo:
+        cofre = CofreTokens(arquivo.read())
+    try:
+        originais = cofre.reidentificar_varios(tokens)
+    finally:
+        cofre.fechar()
+    for token in tokens:
+        print(f"{token}: {originais.get(token, 'não encontrado')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,36 @@
 import encodings
+import hmac
 import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
 from cryptography.fernet import Fernet
-from join import juntar_planilhas
+from join import juntar_planilhas, ler_em_lotes
+from cofre_tokens import CofreTokens
 
+CAMINHO_CHAVE = os.path.join(sys.path[0], "chave.key")
+
+MODO_FERNET = 'fernet'
+MODO_PSEUDONIMIZACAO = 'pseudonimizacao'
+
+# Contexto usado para derivar a chave do HMAC a partir da chave Fernet, para que a mesma chave
+# não seja usada diretamente em dois algoritmos diferentes
+CONTEXTO_PSEUDONIMIZACAO = b'pseudonimizacao-v1'
+
+# Quantidade de caracteres hexadecimais mantidos de cada token (128 bits)
+TAMANHO_TOKEN = 32
+
+COLUNAS_PARA_CRIPTOGRAFAR = ['ID_PESSOA', 'NOME_PESSOA', 'MATR_ALUNO', 'CPF_MASCARA']
+
+# Linhas por lote no pipeline em lotes; o pico de memória é proporcional a este valor
+TAMANHO_LOTE_CRIPTOGRAFIA = 50_000
+FORMATOS_SAIDA = ('parquet', 'csv', 'xlsx')
 
 # Cria uma chave aleatória através do método da biblioteca Fernet
 def criar_chave() -> bytes:
@@ -17,14 +41,33 @@ def criar_chave() -> bytes:
 
 # Cria arquivo para armazenar a chave
 def criar_arquivo_chave():
-    with open(os.path.join(sys.path[0], "chave.key"), "wb") as f:
+    with open(CAMINHO_CHAVE, "wb") as f:
         f.write(criar_chave())
     print('Arquivo chave.key criado na pasta.')
 
 
 # Acessa a chave que estará contida no arquivo chave.key
 def obter_chave() -> bytes:
-    return open('chave.key', 'rb').read()
+    return open(CAMINHO_CHAVE, 'rb').read()
+
+
+# Cria a chave apenas na primeira execução; os tokens só são estáveis entre execuções se a chave for a mesma
+def garantir_chave() -> bytes:
+    if not os.path.exists(CAMINHO_CHAVE):
+        criar_arquivo_chave()
+    return obter_chave()
+
+
+# Deriva a chave do HMAC a partir da chave Fernet
+def derivar_chave_pseudonimizacao(chave: bytes) -> bytes:
+    return hmac.digest(chave, CONTEXTO_PSEUDONIMIZACAO, 'sha256')
+
+
+# Representação textual estável de um identificador: 20231234.0 (lido como float pelo Excel) e 20231234 geram o mesmo token
+def normalizar_identificador(valor) -> str:
+    if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+        valor = int(valor)
+    return str(valor).strip()
 
 
 # Programa
@@ -37,26 +80,202 @@ def criptografar_coluna(df: pd.DataFrame, coluna: str, f: Fernet) -> list:
     return coluna_cript
 
 
-def criar_planilha_criptografada(df: pd.DataFrame):
-    criar_arquivo_chave()
-    f = Fernet(obter_chave())
+# Token determinístico (HMAC-SHA256) de um identificador: o mesmo valor gera sempre o mesmo token
+def gerar_token(valor, chave_hmac: bytes) -> str:
+    return hmac.digest(chave_hmac, normalizar_identificador(valor).encode(), 'sha256').hex()[:TAMANHO_TOKEN]
+
+
+# Pseudonimiza a coluna inteira: o HMAC é calculado uma vez por valor distinto e espalhado pelos códigos do factorize.
+# Valores nulos continuam nulos. Se `registros` for uma lista, recebe as tuplas (token, coluna, original) para o cofre
+def pseudonimizar_coluna(df: pd.DataFrame, coluna: str, chave_hmac: bytes, registros: list = None) -> pd.Series:
+    codigos, unicos = pd.factorize(df[coluna])
+    tokens = np.array([gerar_token(valor, chave_hmac) for valor in unicos] + [None], dtype=object)
+    if registros is not None:
+        registros.extend((token, coluna, normalizar_identificador(valor)) for token, valor in zip(tokens, unicos))
+    return pd.Series(tokens[codigos], index=df.index, name=coluna)
 
-    colunas_para_criptografar = ['ID_PESSOA', 'NOME_PESSOA', 'MATR_ALUNO', 'CPF_MASCARA']
-    for coluna in colunas_para_criptografar:
-        df[coluna] = criptografar_coluna(df, coluna, f)
+
+# Criptografa (ou pseudonimiza) as colunas sensíveis presentes no DataFrame
+def criptografar_dataframe(df: pd.DataFrame, chave: bytes, modo: str = MODO_FERNET,
+                           colunas: list = None, registros: list = None) -> pd.DataFrame:
+    colunas = [coluna for coluna in (COLUNAS_PARA_CRIPTOGRAFAR if colunas is None else colunas) if coluna in df.columns]
+    if modo == MODO_PSEUDONIMIZACAO:
+        chave_hmac = derivar_chave_pseudonimizacao(chave)
+        for coluna in colunas:
+            df[coluna] = pseudonimizar_coluna(df, coluna, chave_hmac, registros)
+    elif modo == MODO_FERNET:
+        f = Fernet(chave)
+        for coluna in colunas:
+            df[coluna] = criptografar_coluna(df, coluna, f)
+    else:
+        raise ValueError(f"Modo de criptografia desconhecido: {modo}")
+    return df
+
+
+# Na pseudonimização, os pares token -> original são guardados no cofre (se usar_cofre) para reidentificação autorizada
+def criar_planilha_criptografada(df: pd.DataFrame, modo: str = MODO_FERNET, usar_cofre: bool = True):
+    chave = garantir_chave()
+    registros = [] if usar_cofre and modo == MODO_PSEUDONIMIZACAO else None
+    df = criptografar_dataframe(df, chave, modo, registros=registros)
+    if registros:
+        registrar_no_cofre(chave, registros)
 
     df.to_excel('planilhaJoinCriptografada.xlsx', index=True, header=True)
     print('Planilha Criptografada criada e adicionada na pasta.')
 
 
+# Grava os tokens no cofre; o cofre é usado apenas pelo processo principal
+def registrar_no_cofre(chave: bytes, registros: list):
+    cofre = CofreTokens(chave)
+    try:
+        cofre.registrar_varios(registros)
+    finally:
+        cofre.fechar()
+
+
+# Executado nos processos do pool. O Fernet gera bytes em base64, gravados como texto.
+# Retorna o lote e os registros para o cofre (vazio se não forem pedidos)
+def criptografar_lote(lote: pd.DataFrame, chave: bytes, modo: str, colunas: list,
+                      registrar_tokens: bool = False) -> tuple:
+    registros = []
+    lote = criptografar_dataframe(lote, chave, modo, colunas, registros if registrar_tokens else None)
+    if modo == MODO_FERNET:
+        for coluna in colunas:
+            if coluna in lote.columns:
+                lote[coluna] = [valor.decode() for valor in lote[coluna]]
+    return lote, registros
+
+
+class EscritorLotes:
+    def __init__(self, caminho: str, formato: str):
+        """
+        Grava lotes de um DataFrame em sequência no mesmo arquivo, sem manter os anteriores em memória.
+        Parquet e CSV são os formatos rápidos; xlsx usa o modo de escrita em fluxo do openpyxl.
+
+        :param caminho: Arquivo de saída.
+        :param formato: Um dos FORMATOS_SAIDA.
+        """
+        if formato not in FORMATOS_SAIDA:
+            raise ValueError(f"Formato de saída desconhecido: {formato}")
+        self.caminho = caminho
+        self.formato = formato
+        self.temporario = caminho + '.tmp'
+        self.esquema = None
+        self.colunas_inteiras = None
+        self._escritor = None
+        self.linhas = 0
+
+    def escrever(self, lote: pd.DataFrame):
+        # As colunas inteiras do primeiro lote continuam inteiras (Int64, que aceita nulos) nos lotes
+        # seguintes, em vez de virarem float quando um lote tem valores ausentes
+        if self.colunas_inteiras is None:
+            self.colunas_inteiras = [campo.name for campo in pa.Schema.from_pandas(lote, preserve_index=False)
+                                     if pa.types.is_integer(campo.type)]
+        lote = lote.astype({coluna: 'Int64' for coluna in self.colunas_inteiras})
+
+        if self.formato == 'parquet':
+            if self._escritor is None:
+                # O esquema é fixado no primeiro lote; colunas vazias no primeiro lote são gravadas como texto
+                esquema = pa.Schema.from_pandas(lote, preserve_index=False)
+                campos = [pa.field(campo.name, pa.string())
+                          if pa.types.is_null(campo.type) or lote[campo.name].isna().all()
+                          else campo for campo in esquema]
+                self.esquema = pa.schema(campos)
+                self._escritor = pq.ParquetWriter(self.temporario, self.esquema)
+            textos = {campo.name: lote[campo.name].astype(object).where(lote[campo.name].isna(), lote[campo.name].astype(str))
+                      for campo in self.esquema
+                      if pa.types.is_string(campo.type) and lote[campo.name].dtype != object}
+            lote = lote.assign(**textos)
+            self._escritor.write_table(pa.Table.from_pandas(lote, schema=self.esquema, preserve_index=False))
+        elif self.formato == 'csv':
+            lote.to_csv(self.temporario, mode='w' if self.linhas == 0 else 'a', header=self.linhas == 0, index=False)
+        else:
+            if self._escritor is None:
+                self._escritor = Workbook(write_only=True)
+                self._planilha = self._escritor.create_sheet()
+                self._planilha.append(list(lote.columns))
+            for linha in lote.astype(object).where(lote.notna(), None).itertuples(index=False, name=None):
+                self._planilha.append(list(linha))
+        self.linhas += len(lote)
+
+    def fechar(self, concluido: bool = True):
+        """
+        Finaliza o arquivo. Só substitui o arquivo de saída se todos os lotes foram gravados.
+        """
+        if self.formato == 'parquet' and self._escritor is not None:
+            self._escritor.close()
+        elif self.formato == 'xlsx' and self._escritor is not None and concluido:
+            self._escritor.save(self.temporario)
+        if os.path.exists(self.temporario):
+            if concluido:
+                os.replace(self.temporario, self.caminho)
+            else:
+                os.remove(self.temporario)
+
+
+# Pipeline em lotes: lê a origem em lotes, criptografa cada lote em um pool de processos e grava o
+# resultado na ordem original à medida que fica pronto. No máximo 2 lotes por processo ficam em memória
+def criptografar_arquivo_em_lotes(caminho_origem: str, caminho_saida: str = None, formato: str = 'parquet',
+                                  modo: str = MODO_FERNET, colunas: list = None,
+                                  tamanho_lote: int = TAMANHO_LOTE_CRIPTOGRAFIA, processos: int = None,
+                                  usar_cofre: bool = True) -> str:
+    chave = garantir_chave()
+    registrar_tokens = usar_cofre and modo == MODO_PSEUDONIMIZACAO
+    cofre = CofreTokens(chave) if registrar_tokens else None
+    colunas = COLUNAS_PARA_CRIPTOGRAFAR if colunas is None else colunas
+    if caminho_saida is None:
+        caminho_saida = f'planilhaJoinCriptografada.{formato}'
+    processos = processos or os.cpu_count() or 1
+
+    escritor = EscritorLotes(caminho_saida, formato)
+    pendentes = deque()
+    concluido = False
+
+    def gravar(pendente):
+        lote, registros = pendente.result()
+        escritor.escrever(lote)
+        if registros:
+            cofre.registrar_varios(registros)
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        try:
+            for lote in ler_em_lotes(caminho_origem, tamanho_lote):
+                pendentes.append(executor.submit(criptografar_lote, lote, chave, modo, colunas, registrar_tokens))
+                if len(pendentes) >= 2 * processos:
+                    gravar(pendentes.popleft())
+            while pendentes:
+                gravar(pendentes.popleft())
+            concluido = True
+        finally:
+            for pendente in pendentes:
+                pendente.cancel()
+            escritor.fechar(concluido)
+            if cofre is not None:
+                cofre.fechar()
+
+    print(f'{escritor.linhas} linhas criptografadas gravadas em {caminho_saida}.')
+    return caminho_saida
+
+
 def main():
     print("Algoritmo de criptografia")
-    nome_planilha1, nome_planilha2 = input(
-        "Digite o nomes das duas planilhas separado por vírgula ('ex: alunos_bsi, endereco_cra_bsi') :").split(',')
+    nomes_planilhas = input(
+        "Digite o nomes das duas planilhas separado por vírgula ('ex: alunos_bsi, endereco_cra_bsi'), "
+        "ou o nome de uma planilha já juntada para processá-la em lotes:").split(',')
+    modo = input(f"Modo ('{MODO_FERNET}' ou '{MODO_PSEUDONIMIZACAO}', padrão '{MODO_FERNET}'): ").strip() or MODO_FERNET
+    if len(nomes_planilhas) == 1:
+        formato = input(f"Formato de saída {FORMATOS_SAIDA} (padrão 'parquet'): ").strip() or 'parquet'
+        nome_planilha = nomes_planilhas[0].strip()
+        if not os.path.splitext(nome_planilha)[1]:
+            nome_planilha += '.xlsx'
+        criptografar_arquivo_em_lotes(nome_planilha, formato=formato, modo=modo)
+        return
+
+    nome_planilha1, nome_planilha2 = nomes_planilhas
     # Juntar as duas planilhas em um DataFrame
     df = juntar_planilhas(nome_planilha1, nome_planilha2)
     # Crie a planilha criptografada a partir do DataFrame
-    criar_planilha_criptografada(df)
+    criar_planilha_criptografada(df, modo)
 
 
 if __name__ == "__main__":
@@ -1,17 +1,151 @@
+import os
+from collections import Counter
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
 
+MODOS_JUNCAO = ('inner', 'left', 'anti')
 
-def juntar_planilhas(nome_planilha1: str, nome_planilha2: str) -> pd.DataFrame:
-    df_1 = pd.read_excel(f'{nome_planilha1.strip()}.xlsx')
-    df_2 = pd.read_excel(f'{nome_planilha2.strip()}.xlsx')
+# Linhas por lote lidas da planilha maior
+TAMANHO_LOTE_JUNCAO = 50_000
 
-    df_join = pd.merge(df_1, df_2, left_on='MATR_ALUNO', right_on='MATRICULA')
+COLUNAS_JUNCAO = ['ID_PESSOA', 'NOME_PESSOA', 'SEXO',
+                  'DT_NASCIMENTO', 'FORMA_INGRESSO', 'FORMA_EVASAO',
+                  'MATR_ALUNO', 'NUM_VERSAO', 'PERIODO_INGRESSO',
+                  'DT_EVASAO', 'PERIODO_EVASAO', 'CPF_MASCARA',
+                  'CRA', 'BAIRRO', 'CIDADE', 'ESTADO']
 
-    colunas = ['ID_PESSOA', 'NOME_PESSOA', 'SEXO',
-               'DT_NASCIMENTO', 'FORMA_INGRESSO', 'FORMA_EVASAO',
-               'MATR_ALUNO', 'NUM_VERSAO', 'PERIODO_INGRESSO',
-               'DT_EVASAO', 'PERIODO_EVASAO', 'CPF_MASCARA',
-               'CRA', 'BAIRRO', 'CIDADE', 'ESTADO']
-    df_join = df_join.filter(items=colunas)
+COLUNA_CHAVE = '_CHAVE_JUNCAO'
+CHAVE_VAZIA = '<vazio>'
 
+
+# Lê um arquivo (.xlsx, .csv ou .parquet) em lotes de `tamanho_lote` linhas, sem carregá-lo inteiro
+def ler_em_lotes(caminho: str, tamanho_lote: int = TAMANHO_LOTE_JUNCAO):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == '.csv':
+        yield from pd.read_csv(caminho, chunksize=tamanho_lote)
+    elif extensao in ('.parquet', '.pq'):
+        # Inteiros com nulos viram Int64, e não float64, para não perder precisão acima de 2**53
+        for lote in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_lote):
+            yield lote.to_pandas(types_mapper=lambda tipo: pd.Int64Dtype() if pa.types.is_integer(tipo) else None)
+    else:
+        # O modo somente leitura do openpyxl percorre a planilha linha a linha
+        planilha = load_workbook(caminho, read_only=True)
+        try:
+            linhas = planilha.active.iter_rows(values_only=True)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                return
+            lote = []
+            for linha in linhas:
+                lote.append(linha)
+                if len(lote) >= tamanho_lote:
+                    yield pd.DataFrame(lote, columns=cabecalho)
+                    lote = []
+            if lote:
+                yield pd.DataFrame(lote, columns=cabecalho)
+        finally:
+            planilha.close()
+
+
+# Chave de junção em texto: 20231234, 20231234.0 e ' 20231234 ' são a mesma matrícula. Vazios viram None
+def normalizar_chave(valor):
+    if pd.isna(valor):
+        return None
+    if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+        valor = int(valor)
+    texto = str(valor).strip()
+    return texto or None
+
+
+# Normaliza a coluna de chave uma vez por valor distinto
+def normalizar_chaves(serie: pd.Series) -> pd.Series:
+    codigos, unicos = pd.factorize(serie)
+    chaves = np.array([normalizar_chave(valor) for valor in unicos] + [None], dtype=object)
+    return pd.Series(chaves[codigos], index=serie.index)
+
+
+def _caminho_planilha(nome: str) -> str:
+    nome = nome.strip()
+    return nome if os.path.splitext(nome)[1] else f'{nome}.xlsx'
+
+
+def _relatorio(lado: str, tipo: str, contagens) -> pd.DataFrame:
+    contagens = pd.Series(contagens, dtype='int64')
+    return pd.DataFrame({'LADO': lado, 'TIPO': tipo, 'CHAVE': contagens.index, 'OCORRENCIAS': contagens.to_numpy()})
+
+
+# Junta as planilhas de alunos (MATR_ALUNO) e de endereço/CRA (MATRICULA) com um hash join: a planilha menor
+# é lida inteira e indexada pela chave normalizada, e a maior é percorrida em lotes.
+# Modos, sempre em relação à primeira planilha: 'inner' (só alunos com correspondência), 'left' (todos os
+# alunos, com colunas da segunda planilha vazias quando não há correspondência) e 'anti' (só os alunos sem
+# correspondência, para auditoria). Chaves sem correspondência e duplicadas são informadas com as contagens.
+def juntar_planilhas(nome_planilha1: str, nome_planilha2: str, modo: str = 'inner',
+                     tamanho_lote: int = TAMANHO_LOTE_JUNCAO, retornar_relatorio: bool = False):
+    if modo not in MODOS_JUNCAO:
+        raise ValueError(f"Modo de junção desconhecido: {modo}")
+
+    esquerda = {'lado': 'esquerda', 'caminho': _caminho_planilha(nome_planilha1), 'chave': 'MATR_ALUNO'}
+    direita = {'lado': 'direita', 'caminho': _caminho_planilha(nome_planilha2), 'chave': 'MATRICULA'}
+    menor, maior = sorted((esquerda, direita), key=lambda lado: os.path.getsize(lado['caminho']))
+
+    indice = pd.concat(list(ler_em_lotes(menor['caminho'], tamanho_lote)), ignore_index=True)
+    indice[COLUNA_CHAVE] = normalizar_chaves(indice[menor['chave']])
+    chaves_indice = set(indice[COLUNA_CHAVE].dropna())
+    tipos = {menor['lado']: indice[menor['chave']].dtype}
+
+    sem_correspondencia_maior = Counter()
+    contagens_maior = Counter()
+    partes = []
+    estrutura_maior = None
+    for lote in ler_em_lotes(maior['caminho'], tamanho_lote):
+        tipos.setdefault(maior['lado'], lote[maior['chave']].dtype)
+        lote[COLUNA_CHAVE] = normalizar_chaves(lote[maior['chave']])
+        estrutura_maior = lote.iloc[:0] if estrutura_maior is None else estrutura_maior
+        contagens_maior.update(lote[COLUNA_CHAVE].dropna())
+        com_correspondencia = lote[COLUNA_CHAVE].isin(chaves_indice).to_numpy()
+        sem_correspondencia_maior.update(lote.loc[~com_correspondencia, COLUNA_CHAVE].fillna(CHAVE_VAZIA))
+
+        # A junção é sempre montada como (esquerda, direita), para manter os sufixos do pd.merge; no modo
+        # 'left', os alunos sem correspondência são juntados a uma tabela vazia, com as mesmas colunas
+        if maior is esquerda:
+            if modo != 'anti':
+                partes.append(lote[com_correspondencia].merge(indice, on=COLUNA_CHAVE))
+            if modo == 'left':
+                partes.append(lote[~com_correspondencia].merge(indice.iloc[:0], on=COLUNA_CHAVE, how='left'))
+            elif modo == 'anti':
+                partes.append(lote[~com_correspondencia])
+        elif modo != 'anti':
+            partes.append(indice.merge(lote[com_correspondencia], on=COLUNA_CHAVE))
+
+    sem_correspondencia_menor = ~indice[COLUNA_CHAVE].isin(set(contagens_maior))
+    if menor is esquerda and modo == 'left':
+        estrutura_maior = pd.DataFrame(columns=[COLUNA_CHAVE]) if estrutura_maior is None else estrutura_maior
+        partes.append(indice[sem_correspondencia_menor].merge(estrutura_maior, on=COLUNA_CHAVE, how='left'))
+    elif menor is esquerda and modo == 'anti':
+        partes.append(indice[sem_correspondencia_menor])
+
+    df_join = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=indice.columns)
+    df_join = df_join.filter(items=COLUNAS_JUNCAO)
+
+    contagens_menor = indice[COLUNA_CHAVE].value_counts()
+    relatorio = pd.concat([
+        _relatorio(menor['lado'], 'sem_correspondencia',
+                   indice.loc[sem_correspondencia_menor, COLUNA_CHAVE].fillna(CHAVE_VAZIA).value_counts()),
+        _relatorio(maior['lado'], 'sem_correspondencia', sem_correspondencia_maior),
+        _relatorio(menor['lado'], 'duplicada', contagens_menor[contagens_menor > 1]),
+        _relatorio(maior['lado'], 'duplicada', {chave: n for chave, n in contagens_maior.items() if n > 1}),
+    ], ignore_index=True)
+
+    if maior['lado'] in tipos and tipos['esquerda'] != tipos['direita']:
+        print(f"Tipos diferentes nas chaves ({esquerda['chave']}: {tipos['esquerda']}, "
+              f"{direita['chave']}: {tipos['direita']}); as chaves foram normalizadas para texto.")
+    for (lado, tipo), grupo in relatorio.groupby(['LADO', 'TIPO'], sort=False):
+        print(f"Chaves {tipo.replace('_', ' ')} na planilha da {lado}: {len(grupo)} ({grupo['OCORRENCIAS'].sum()} linhas)")
+    print(f"Junção '{modo}' concluída: {len(df_join)} linhas.")
+
+    if retornar_relatorio:
+        return df_join, relatorio
     return df_join
@@ -1,7 +1,50 @@
+import json
 import os
 import unidecode
+import numpy as np
 import pandas as pd
 
+# Esquema explícito do DataFrame principal processado. As colunas de data e numéricas são
+# convertidas para esses tipos antes de serem gravadas no Parquet, para que a releitura
+# devolva exatamente os tipos produzidos por `converter_tipos` sem nenhuma conversão.
+ESQUEMA_DF_PRINCIPAL = {
+    'DT_NASCIMENTO': 'datetime64[ns]',
+    'DT_EVASAO': 'datetime64[ns]',
+    'CRA': 'float64',
+    'CRA_ARREDONDADO': 'float64',
+    'PERIODO_INGRESSO': 'Int16',
+    'PERIODO_EVASAO': 'Int16',
+    'PERIODO_INGRESSO_FORMATADO': 'string',
+    'PERIODO_EVASAO_FORMATADO': 'string',
+    'ANO_PERIODO_INGRESSO': 'Int16',
+    'ANO_PERIODO_EVASAO': 'Int16',
+    'INDICE_PERIODO_INGRESSO': 'Int32',
+    'INDICE_PERIODO_EVASAO': 'Int32',
+    'IDADE_INGRESSO': 'float64',
+    'IDADE_EVASAO': 'float64',
+    'TEMPO_CURSO': 'float64',
+    'DISTANCIA_URCA': 'float64',
+    'DISTANCIA_REDE_URCA': 'float64',
+    'LATITUDE': 'float64',
+    'LONGITUDE': 'float64',
+    'DISTANCIA_ESTACAO': 'float64',
+    'ESTACOES_NO_RAIO': 'Int32',
+}
+
+EXTENSOES_COLUNARES = ('.parquet', '.pq')
+
+# Memo persistente da normalização de textos (valor original -> valor normalizado, por caixa)
+CAMINHO_MEMO_NORMALIZACAO = os.path.join('dados', 'cache', 'normalizacao.json')
+CASOS_NORMALIZACAO = {
+    'lower': str.lower,
+    'upper': str.upper,
+    'title': str.title,
+}
+_memo_normalizacao = None
+
+# Tabelas de correção já compiladas, indexadas pelo conteúdo da tabela
+_correcoes_compiladas = {}
+
 
 def pega_caminho_base():
     """
@@ -10,24 +53,75 @@ def pega_caminho_base():
     return os.path.abspath(os.path.join(os.path.dirname(__file__), '../', '..'))
 
 
-def carregar_dados(caminho='dados/processado/dfPrincipal.csv'):
+def aplicar_esquema(dataframe, esquema=None):
+    """
+    Converte as colunas presentes no DataFrame para os tipos definidos no esquema.
+    :param dataframe: DataFrame a ser convertido.
+    :param esquema: Dicionário coluna -> tipo. Usa o esquema do DataFrame principal por padrão.
+    :return: DataFrame com os tipos ajustados.
+    """
+    esquema = ESQUEMA_DF_PRINCIPAL if esquema is None else esquema
+    tipos = {coluna: tipo for coluna, tipo in esquema.items() if coluna in dataframe.columns}
+    datas = {
+        coluna: pd.to_datetime(dataframe[coluna], errors='coerce')
+        for coluna, tipo in tipos.items()
+        if str(tipo).startswith('datetime64') and not pd.api.types.is_datetime64_any_dtype(dataframe[coluna])
+    }
+    return dataframe.assign(**datas).astype(tipos)
+
+
+def restaurar_nulos_texto(dataframe):
+    """
+    O Parquet devolve None nos valores ausentes das colunas de texto, enquanto o read_excel e a
+    formatação produzem NaN. Troca None por NaN para que o DataFrame lido seja igual ao original.
+    :param dataframe: DataFrame lido de um arquivo Parquet.
+    :return: O mesmo DataFrame, com NaN nas colunas de texto.
+    """
+    colunas_texto = dataframe.select_dtypes(include='object').columns
+    dataframe[colunas_texto] = dataframe[colunas_texto].where(dataframe[colunas_texto].notna(), np.nan)
+    return dataframe
+
+
+def carregar_dados(caminho='dados/processado/dfPrincipal.parquet', colunas=None):
     """
-    Carrega o DataFrame de um arquivo CSV.
+    Carrega o DataFrame de um arquivo Parquet ou CSV.
+    Arquivos Parquet são lidos sem nenhuma conversão e apenas com as colunas pedidas.
+    Se o Parquet ainda não existir, o CSV de mesmo nome é lido e convertido pelo esquema.
+    :param caminho: Caminho relativo à raiz do projeto (ou absoluto).
+    :param colunas: Lista de colunas a serem lidas (opcional).
+    :return: DataFrame carregado.
     """
     caminho_completo = os.path.join(pega_caminho_base(), caminho)
-    if os.path.exists(caminho_completo):
-        return pd.read_csv(caminho_completo)
-    else:
-        print(f"Arquivo não encontrado: {caminho_completo}")
-        return pd.DataFrame()
+    raiz, extensao = os.path.splitext(caminho_completo)
+
+    if extensao in EXTENSOES_COLUNARES:
+        if os.path.exists(caminho_completo):
+            return pd.read_parquet(caminho_completo, columns=colunas)
+        caminho_csv = raiz + '.csv'
+        if os.path.exists(caminho_csv):
+            print(f"Arquivo Parquet não encontrado, lendo CSV legado: {caminho_csv}")
+            return aplicar_esquema(pd.read_csv(caminho_csv, usecols=colunas))
+    elif os.path.exists(caminho_completo):
+        return pd.read_csv(caminho_completo, usecols=colunas)
+
+    print(f"Arquivo não encontrado: {caminho_completo}")
+    return pd.DataFrame()
 
 
-def salvar_dados(dataframe, caminho='dados/processado/dfPrincipal.csv'):
+def salvar_dados(dataframe, caminho='dados/processado/dfPrincipal.parquet', esquema=None):
     """
-    Salva um DataFrame em um arquivo CSV.
+    Salva um DataFrame em um arquivo Parquet ou CSV, de acordo com a extensão do caminho.
+    No Parquet as colunas são convertidas pelo esquema e os textos ficam codificados em dicionário.
+    :param dataframe: DataFrame a ser salvo.
+    :param caminho: Caminho relativo à raiz do projeto (ou absoluto).
+    :param esquema: Dicionário coluna -> tipo (opcional, padrão: esquema do DataFrame principal).
     """
     caminho_completo = os.path.join(pega_caminho_base(), caminho)
-    dataframe.to_csv(caminho_completo, index=False)
+    os.makedirs(os.path.dirname(caminho_completo), exist_ok=True)
+    if os.path.splitext(caminho_completo)[1] in EXTENSOES_COLUNARES:
+        aplicar_esquema(dataframe, esquema).to_parquet(caminho_completo, index=False, engine='pyarrow')
+    else:
+        dataframe.to_csv(caminho_completo, index=False)
     print(f"Arquivo salvo em: {caminho_completo}")
 
 
@@ -38,23 +132,132 @@ def remover_acentos_e_maiusculas(texto):
     return unidecode.unidecode(texto).upper() if isinstance(texto, str) else texto
 
 
+def normalizar_texto(valor, case='lower'):
+    """
+    Remove acentos, ajusta a caixa e remove espaços das pontas de um único valor.
+    """
+    return CASOS_NORMALIZACAO[case](unidecode.unidecode(str(valor))).strip()
+
+
+def _caminho_memo_normalizacao():
+    return os.path.join(pega_caminho_base(), CAMINHO_MEMO_NORMALIZACAO)
+
+
+def carregar_memo_normalizacao():
+    """
+    Carrega (uma única vez por processo) o memo de normalização salvo em execuções anteriores.
+    :return: Dicionário caixa -> {valor original: valor normalizado}.
+    """
+    global _memo_normalizacao
+    if _memo_normalizacao is None:
+        _memo_normalizacao = {case: {} for case in CASOS_NORMALIZACAO}
+        caminho = _caminho_memo_normalizacao()
+        if os.path.exists(caminho):
+            try:
+                with open(caminho, encoding='utf-8') as arquivo:
+                    for case, valores in json.load(arquivo).items():
+                        if case in _memo_normalizacao:
+                            _memo_normalizacao[case].update(valores)
+            except (OSError, ValueError) as e:
+                print(f"Memo de normalização ignorado ({caminho}): {e}")
+    return _memo_normalizacao
+
+
+def salvar_memo_normalizacao():
+    """
+    Grava o memo de normalização em disco, de forma atômica.
+    """
+    caminho = _caminho_memo_normalizacao()
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(carregar_memo_normalizacao(), arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
 def limpar_e_normalizar(df, coluna, case='lower'):
     """
     Limpa e normaliza os valores de uma coluna em um DataFrame.
+    Apenas os valores distintos são normalizados (consultando o memo persistente antes), e o
+    resultado é expandido de volta para as linhas pelos códigos do factorize.
+    :param df: DataFrame a ser alterado.
+    :param coluna: Coluna de texto a ser normalizada.
+    :param case: Caixa do resultado: 'lower', 'upper' ou 'title'.
+    :return: DataFrame com a coluna normalizada.
     """
-    if case == 'lower':
-        df[coluna] = df[coluna].apply(lambda x: unidecode.unidecode(str(x)).lower().strip())
-    elif case == 'upper':
-        df[coluna] = df[coluna].apply(lambda x: unidecode.unidecode(str(x)).upper().strip())
-    elif case == 'title':
-        df[coluna] = df[coluna].apply(lambda x: unidecode.unidecode(str(x)).title().strip())
+    if case not in CASOS_NORMALIZACAO:
+        return df
+
+    codigos, unicos = pd.factorize(df[coluna], use_na_sentinel=False)
+    memo = carregar_memo_normalizacao()[case]
+    chaves = [str(valor) for valor in unicos]
+    novos = 0
+    for chave in chaves:
+        if chave not in memo:
+            memo[chave] = normalizar_texto(chave, case)
+            novos += 1
+    if novos:
+        salvar_memo_normalizacao()
+
+    normalizados = np.array([memo[chave] for chave in chaves], dtype=object)
+    df[coluna] = pd.Series(normalizados[codigos], index=df.index, dtype=object)
     return df
 
 
-def corrigir_nomes(df, coluna, correcoes):
+def compilar_correcoes(correcoes):
+    """
+    Compila um dicionário de correções (correto -> lista de variantes erradas) em um único
+    mapeamento variante -> valor canônico.
+    O resultado reproduz a aplicação sequencial das correções na ordem do dicionário, inclusive
+    quando o valor corrigido por uma entrada aparece como variante de uma entrada posterior.
+    :param correcoes: Dicionário correto -> lista de variantes.
+    :return: Dicionário variante -> valor canônico.
+    """
+    chave = tuple((correto, tuple(errados)) for correto, errados in correcoes.items())
+    if chave not in _correcoes_compiladas:
+        mapa = {}
+        for errados in correcoes.values():
+            for errado in errados:
+                valor = errado
+                for correto, variantes in correcoes.items():
+                    if valor in variantes:
+                        valor = correto
+                mapa[errado] = valor
+        _correcoes_compiladas[chave] = mapa
+    return _correcoes_compiladas[chave]
+
+
+def corrigir_nomes(df, coluna, correcoes, retornar_relatorio=False):
     """
     Corrige valores de uma coluna com base em um dicionário de correções.
+    As correções são compiladas em um único mapeamento e aplicadas de uma vez sobre os valores
+    distintos da coluna. Ao final, é exibido quantas correções foram aplicadas e quais entradas
+    do dicionário não corresponderam a nenhum registro.
+    :param df: DataFrame a ser alterado.
+    :param coluna: Coluna a ser corrigida.
+    :param correcoes: Dicionário correto -> lista de variantes.
+    :param retornar_relatorio: Se True, retorna também o relatório por variante.
+    :return: DataFrame corrigido ou, com retornar_relatorio=True, tupla (DataFrame, relatório), onde o
+             relatório tem as colunas VARIANTE, CORRETO e OCORRENCIAS.
     """
-    for correto, errados in correcoes.items():
-        df[coluna] = df[coluna].replace(errados, correto)
+    mapa = compilar_correcoes(correcoes)
+    codigos, unicos = pd.factorize(df[coluna], use_na_sentinel=False)
+    corrigidos = np.array([mapa.get(valor, valor) for valor in unicos], dtype=object)
+    df[coluna] = pd.Series(corrigidos[codigos], index=df.index, dtype=object)
+
+    ocorrencias = dict(zip(unicos, np.bincount(codigos, minlength=len(unicos))))
+    relatorio = pd.DataFrame(
+        [(variante, correto, int(ocorrencias.get(variante, 0))) for variante, correto in mapa.items()],
+        columns=['VARIANTE', 'CORRETO', 'OCORRENCIAS']
+    )
+
+    aplicadas = relatorio[(relatorio['OCORRENCIAS'] > 0) & (relatorio['VARIANTE'] != relatorio['CORRETO'])]
+    sem_uso = relatorio.loc[relatorio['OCORRENCIAS'] == 0, 'VARIANTE']
+    print(f"Correções em {coluna}: {aplicadas['OCORRENCIAS'].sum()} registros corrigidos "
+          f"por {len(aplicadas)} variantes; {len(sem_uso)} de {len(relatorio)} variantes sem ocorrências.")
+    if len(sem_uso) > 0:
+        print(f"  Variantes sem ocorrências em {coluna}: {', '.join(sem_uso)}")
+
+    if retornar_relatorio:
+        return df, relatorio
     return df
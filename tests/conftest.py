@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do projeto são importados como src.<pacote>, a partir da raiz do repositório
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,28 @@
+import json
+
+import pandas as pd
+
+from src.formatacao.centroides import atribuir_bairros_por_coordenadas
+
+
+def quadrado(longitude, latitude, lado=0.01):
+    return [[[longitude, latitude], [longitude + lado, latitude], [longitude + lado, latitude + lado],
+             [longitude, latitude + lado], [longitude, latitude]]]
+
+
+def test_nome_do_poligono_e_levado_ao_vocabulario_das_zonas(tmp_path):
+    limites = tmp_path / 'limites.geojson'
+    limites.write_text(json.dumps({'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'nome': 'Bairro Imperial de São Cristóvão'},
+         'geometry': {'type': 'Polygon', 'coordinates': quadrado(-43.23, -22.90)}},
+        {'type': 'Feature', 'properties': {'nome': 'Vila Sem Zona'},
+         'geometry': {'type': 'Polygon', 'coordinates': quadrado(-43.30, -22.90)}},
+    ]}))
+    df = pd.DataFrame({'BAIRRO': ['sao cristovao', 'tijuca'], 'CIDADE': ['rio de janeiro'] * 2,
+                       'ZONA': ['Zona Norte'] * 2, 'LATITUDE': [-22.895, -22.895], 'LONGITUDE': [-43.225, -43.295]})
+
+    df = atribuir_bairros_por_coordenadas(df, str(limites), centroides={'bairros': {}, 'municipios': {}})
+
+    assert df['BAIRRO'].tolist() == ['sao cristovao', 'tijuca']
+    assert df['ZONA'].tolist() == ['Zona Norte', 'Zona Norte']
+    assert df['ORIGEM_BAIRRO'].tolist() == ['poligono', 'texto']
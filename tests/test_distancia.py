@@ -0,0 +1,129 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from geopy.exc import GeocoderTimedOut
+
+from src.formatacao.cache_geocodificacao import CacheGeocodificacao
+from src.formatacao.geocodificacao_assincrona import GeocodificadorAssincrono
+from src.formatacao.distancia import adicionar_distancia_ate_urca, adicionar_distancias_referencias, COORDENADAS_URCA
+
+CENTROIDES = {
+    'bairros': {'urca': COORDENADAS_URCA, 'tijuca': (-22.9250, -43.2330)},
+    'municipios': {'niteroi': (-22.8832, -43.1034)},
+}
+
+
+class GeolocatorSemResultado:
+    def __init__(self):
+        self.chamadas = 0
+
+    def geocode(self, endereco):
+        self.chamadas += 1
+        return None
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CacheGeocodificacao(str(tmp_path / 'geocodificacao.sqlite'))
+    yield cache
+    cache.fechar()
+
+
+def test_bairro_fora_da_capital_mantem_distancia_do_bairro(cache):
+    df = pd.DataFrame({'BAIRRO': ['icarai', 'itaipu', 'tijuca'],
+                       'CIDADE': ['niteroi', 'niteroi', 'rio de janeiro'],
+                       'ESTADO': ['Rio de Janeiro'] * 3})
+    distancias = pd.DataFrame({'BAIRRO': ['icarai', 'itaipu'], 'CIDADE': ['niteroi', 'niteroi'],
+                               'ESTADO': ['Rio de Janeiro'] * 2, 'DISTANCIA_URCA': [8.44, 14.14]})
+
+    df, _, _, chaves = adicionar_distancia_ate_urca(df, distancias, GeolocatorSemResultado(), set(), CENTROIDES,
+                                                    cache, retornar_estatisticas=True)
+
+    assert df['DISTANCIA_URCA'].tolist()[:2] == [8.44, 14.14]
+    assert chaves['ORIGEM'].tolist() == ['dfDistancias', 'dfDistancias', 'gazetteer']
+
+
+def test_centroide_do_municipio_so_como_ultimo_recurso(cache):
+    df = pd.DataFrame({'BAIRRO': ['piratininga'], 'CIDADE': ['niteroi'], 'ESTADO': ['Rio de Janeiro']})
+    geolocator = GeolocatorSemResultado()
+
+    df, _, bairros_falha, chaves = adicionar_distancia_ate_urca(df, pd.DataFrame(), geolocator, set(), CENTROIDES,
+                                                                cache, retornar_estatisticas=True)
+
+    assert geolocator.chamadas == 1
+    assert chaves['ORIGEM'].tolist() == ['municipio']
+    assert df['DISTANCIA_URCA'].iloc[0] == pytest.approx(9.65)
+    assert bairros_falha == {('piratininga', 'niteroi', 'Rio de Janeiro')}
+
+
+def test_bairro_homonimo_em_outra_cidade_nao_herda_distancia_nem_falha(cache):
+    df = pd.DataFrame({'BAIRRO': ['centro', 'centro', 'cidade nova'],
+                       'CIDADE': ['Rio de Janeiro', 'petropolis', 'rio de janeiro'],
+                       'ESTADO': ['Rio de Janeiro'] * 3})
+    # Arquivo antigo, só com o nome do bairro: vale apenas para a capital
+    distancias = pd.DataFrame({'BAIRRO': ['centro'], 'DISTANCIA_URCA': [4.62]})
+    bairros_falha = {('cidade nova', 'belo horizonte', 'Minas Gerais')}
+
+    df, distancias, bairros_falha, chaves = adicionar_distancia_ate_urca(
+        df, distancias, GeolocatorSemResultado(), bairros_falha, CENTROIDES, cache, retornar_estatisticas=True)
+
+    assert chaves['ORIGEM'].tolist() == ['dfDistancias', 'falha', 'falha']
+    assert df['DISTANCIA_URCA'].iloc[0] == 4.62
+    assert df['DISTANCIA_URCA'].iloc[1:].isna().all()
+    assert ('centro', 'petropolis', 'Rio de Janeiro') in bairros_falha
+    assert distancias.set_index(['BAIRRO', 'CIDADE'])['DISTANCIA_URCA'].loc[('centro', 'rio de janeiro')] == 4.62
+
+
+def test_distancia_legada_de_outra_cidade_cai_no_centroide_do_municipio(cache):
+    df = pd.DataFrame({'BAIRRO': ['centro'], 'CIDADE': ['niteroi'], 'ESTADO': ['Rio de Janeiro']})
+    distancias = pd.DataFrame({'BAIRRO': ['centro'], 'DISTANCIA_URCA': [23.57]})
+
+    df, _, _, chaves = adicionar_distancia_ate_urca(df, distancias, GeolocatorSemResultado(), set(), CENTROIDES,
+                                                    cache, retornar_estatisticas=True)
+
+    assert chaves['ORIGEM'].tolist() == ['municipio']
+    assert df['DISTANCIA_URCA'].iloc[0] == pytest.approx(9.65)
+
+
+class GeolocatorCopacabana(GeolocatorSemResultado):
+    def geocode(self, endereco):
+        super().geocode(endereco)
+        return SimpleNamespace(latitude=-22.9711, longitude=-43.1822)
+
+
+def test_endereco_com_distancia_legada_recebe_coordenadas(cache):
+    df = pd.DataFrame({'BAIRRO': ['copacabana', 'copacabana'], 'CIDADE': ['rio de janeiro'] * 2,
+                       'ESTADO': ['Rio de Janeiro'] * 2})
+    distancias = pd.DataFrame({'BAIRRO': ['copacabana'], 'DISTANCIA_URCA': [2.59]})
+    geolocator = GeolocatorCopacabana()
+
+    df, _, _, chaves = adicionar_distancia_ate_urca(df, distancias, geolocator, set(), CENTROIDES, cache,
+                                                    retornar_estatisticas=True)
+    df = adicionar_distancias_referencias(df)
+
+    assert geolocator.chamadas == 1
+    assert chaves['ORIGEM'].tolist() == ['geocodificacao']
+    assert df[['LATITUDE', 'LONGITUDE']].notna().all(axis=None)
+    assert df['DISTANCIA_CENTRAL_DO_BRASIL'].notna().all()
+    assert (df['REFERENCIA_MAIS_PROXIMA'] == 'URCA').all()
+
+
+class GeolocatorForaDoAr:
+    def geocode(self, endereco):
+        raise GeocoderTimedOut('timeout')
+
+
+def test_erro_transitorio_fica_pendente(cache):
+    df = pd.DataFrame({'BAIRRO': ['piratininga'], 'CIDADE': ['niteroi'], 'ESTADO': ['Rio de Janeiro']})
+    geocodificador = GeocodificadorAssincrono(GeolocatorForaDoAr(), cache, taxa=100, espera_inicial=0.01)
+
+    _, distancias, bairros_falha, chaves = adicionar_distancia_ate_urca(
+        df, pd.DataFrame(), GeolocatorForaDoAr(), set(), CENTROIDES, cache, geocodificador, retornar_estatisticas=True)
+
+    assert bairros_falha == set()
+    assert 'piratininga' not in distancias['BAIRRO'].tolist()
+    assert cache.obter('piratininga, niteroi, Rio de Janeiro') is None
+    # Enquanto isso, a distância sai do centroide do município, mas o endereço continua pendente
+    assert chaves['ORIGEM'].tolist() == ['pendente']
+    assert chaves['DISTANCIA_URCA'].iloc[0] == pytest.approx(9.65)
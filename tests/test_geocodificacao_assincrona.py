@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from geopy.exc import GeocoderTimedOut
+
+from src.formatacao.cache_geocodificacao import CacheGeocodificacao, STATUS_ENCONTRADO, STATUS_NAO_ENCONTRADO
+from src.formatacao.distancia import inicializar_geolocator
+from src.formatacao.geocodificacao_assincrona import GeocodificadorAssincrono, LimitadorTaxa
+
+Local = namedtuple('Local', ['latitude', 'longitude'])
+TAXA = 20
+RETRY_AFTER = 1
+
+
+class GeolocatorInstavel:
+    def __init__(self, falhas, sempre_falha=()):
+        """
+        Falha `falhas` vezes em cada endereço antes de responder; endereços em `sempre_falha` nunca respondem.
+        """
+        self.falhas = falhas
+        self.sempre_falha = set(sempre_falha)
+        self.chamadas = {}
+        self.instantes = []
+
+    def geocode(self, endereco):
+        self.instantes.append(time.monotonic())
+        self.chamadas[endereco] = self.chamadas.get(endereco, 0) + 1
+        if endereco in self.sempre_falha or self.chamadas[endereco] <= self.falhas:
+            raise GeocoderTimedOut('timeout')
+        return Local(-22.9, -43.2)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CacheGeocodificacao(str(tmp_path / 'geocodificacao.sqlite'))
+    yield cache
+    cache.fechar()
+
+
+def test_limitador_espaca_as_requisicoes():
+    async def adquirir_varias(limitador, quantidade):
+        instantes = []
+        for _ in range(quantidade):
+            await limitador.adquirir()
+            instantes.append(time.monotonic())
+        return instantes
+
+    instantes = asyncio.run(adquirir_varias(LimitadorTaxa(TAXA), 6))
+
+    intervalos = [depois - antes for antes, depois in zip(instantes, instantes[1:])]
+    assert min(intervalos) >= 1 / TAXA * 0.9
+
+
+def test_novas_tentativas_ate_responder(cache):
+    geolocator = GeolocatorInstavel(falhas=2)
+    geocodificador = GeocodificadorAssincrono(geolocator, cache, taxa=TAXA, tentativas=3, espera_inicial=0.01)
+
+    resultados = geocodificador.geocodificar_lote(['a', 'b'])
+
+    assert resultados == {'a': (-22.9, -43.2), 'b': (-22.9, -43.2)}
+    assert geolocator.chamadas == {'a': 3, 'b': 3}
+    intervalos = [depois - antes for antes, depois in zip(geolocator.instantes, geolocator.instantes[1:])]
+    assert min(intervalos) >= 1 / TAXA * 0.9
+    assert cache.obter('a')[2] == STATUS_ENCONTRADO
+
+
+def test_falha_parcial_nao_e_gravada(cache):
+    geolocator = GeolocatorInstavel(falhas=0, sempre_falha={'b'})
+    geocodificador = GeocodificadorAssincrono(geolocator, cache, taxa=TAXA, tentativas=3, espera_inicial=0.01)
+
+    resultados = geocodificador.geocodificar_lote(['a', 'b', 'c'])
+
+    assert set(resultados) == {'a', 'c'}
+    assert geolocator.chamadas['b'] == 3
+    assert cache.obter('b') is None
+    assert cache.obter('c')[2] == STATUS_ENCONTRADO
+
+
+class ServidorNominatim(BaseHTTPRequestHandler):
+    """
+    Nominatim mínimo: responde 429 (com Retry-After) à primeira consulta de cada endereço e, a partir
+    da segunda, o resultado; 'inexistente' nunca é encontrado.
+    """
+    consultas = []
+
+    def do_GET(self):
+        endereco = parse_qs(urlparse(self.path).query)['q'][0]
+        self.consultas.append((endereco, time.monotonic()))
+        if endereco != 'inexistente' and sum(consulta == endereco for consulta, _ in self.consultas) == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', str(RETRY_AFTER))
+            self.end_headers()
+            return
+
+        corpo = b'[]' if endereco == 'inexistente' else \
+            b'[{"lat": "-22.9497", "lon": "-43.1640", "display_name": "Urca, Rio de Janeiro"}]'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    ServidorNominatim.consultas = []
+    servidor = HTTPServer(('127.0.0.1', 0), ServidorNominatim)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_geocodificacao_por_http_respeita_retry_after(cache, servidor):
+    geolocator = inicializar_geolocator(f'127.0.0.1:{servidor.server_address[1]}', esquema='http')
+    geocodificador = GeocodificadorAssincrono(geolocator, cache, taxa=TAXA, tentativas=3, espera_inicial=0.01)
+
+    resultados = geocodificador.geocodificar_lote(['urca', 'inexistente'])
+
+    assert resultados == {'urca': (-22.9497, -43.1640), 'inexistente': None}
+    instantes = [instante for endereco, instante in ServidorNominatim.consultas if endereco == 'urca']
+    assert len(instantes) == 2
+    assert instantes[1] - instantes[0] >= RETRY_AFTER * 0.9
+    assert cache.obter('urca')[2] == STATUS_ENCONTRADO
+    assert cache.obter('inexistente')[2] == STATUS_NAO_ENCONTRADO
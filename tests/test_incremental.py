@@ -0,0 +1,40 @@
+import pandas as pd
+
+from src.formatacao.incremental import calcular_impressoes, calcular_impressoes_entradas, carregar_estado_incremental, \
+    formatar_incremental, salvar_estado_incremental
+
+
+class Formatador:
+    def __init__(self):
+        self.linhas = []
+
+    def __call__(self, df_bruto):
+        self.linhas.append(df_bruto['MATR_ALUNO'].tolist())
+        origens = {'A': 'geocodificacao', 'B': 'pendente'}
+        return df_bruto.assign(ORIGEM_DISTANCIA=df_bruto['MATR_ALUNO'].map(origens))
+
+
+def test_linhas_com_distancia_pendente_sao_refeitas(tmp_path):
+    df = pd.DataFrame({'MATR_ALUNO': ['A', 'B'], 'BAIRRO': ['tijuca', 'icarai']})
+    impressoes = calcular_impressoes(df)
+    formatar = Formatador()
+
+    salvar_estado_incremental(formatar(df), impressoes, {'versao': 1}, str(tmp_path))
+    resultado = formatar_incremental(df, impressoes, formatar, {'versao': 1}, str(tmp_path))
+
+    assert formatar.linhas == [['A', 'B'], ['B']]
+    assert resultado['MATR_ALUNO'].tolist() == ['A', 'B']
+
+
+def test_estado_descartado_quando_entrada_externa_muda(tmp_path):
+    paradas = tmp_path / 'stops.txt'
+    paradas.write_text('stop_id,stop_lat,stop_lon\n1,-22.9,-43.2\n')
+    df = pd.DataFrame({'MATR_ALUNO': ['A'], 'BAIRRO': ['tijuca']})
+    parametros = {'versao': 1, 'entradas': calcular_impressoes_entradas({'paradas_gtfs': str(paradas)})}
+    salvar_estado_incremental(Formatador()(df), calcular_impressoes(df), parametros, str(tmp_path))
+    assert carregar_estado_incremental(parametros, str(tmp_path)) is not None
+
+    paradas.write_text('stop_id,stop_lat,stop_lon\n1,-22.9,-43.2\n2,-22.8,-43.3\n')
+    parametros = {'versao': 1, 'entradas': calcular_impressoes_entradas({'paradas_gtfs': str(paradas)})}
+
+    assert carregar_estado_incremental(parametros, str(tmp_path)) is None
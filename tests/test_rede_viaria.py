@@ -0,0 +1,72 @@
+import pytest
+
+from src.formatacao.centroides import distancia_haversine
+from src.formatacao.rede_viaria import ler_rede_osm, DistanciasRede
+
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="-22.950" lon="-43.170"/>
+  <node id="2" lat="-22.950" lon="-43.160"/>
+  <node id="3" lat="-22.950" lon="-43.150"/>
+  <node id="4" lat="-22.940" lon="-43.150"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="residential"/>
+  </way>
+  <way id="11">
+    <nd ref="2"/><nd ref="3"/><nd ref="4"/>
+    <tag k="highway" v="residential"/>
+    <tag k="oneway" v="yes"/>
+  </way>
+</osm>
+"""
+
+
+def test_trecho_compartilhado_por_duas_vias_nao_tem_comprimento_dobrado(tmp_path):
+    caminho = tmp_path / 'rede.osm'
+    caminho.write_text(OSM, encoding='utf-8')
+
+    pontos, grafo = ler_rede_osm(str(caminho))
+
+    indices = {(round(latitude, 3), round(longitude, 3)): posicao for posicao, (latitude, longitude) in enumerate(pontos)}
+    b, c = indices[(-22.95, -43.16)], indices[(-22.95, -43.15)]
+    trecho = distancia_haversine(-22.95, -43.16, -22.95, -43.15)
+    assert grafo[b, c] == pytest.approx(trecho)
+    assert grafo[c, b] == pytest.approx(trecho)
+
+
+OSM_COM_FRAGMENTO = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="-22.950" lon="-43.170"/>
+  <node id="2" lat="-22.950" lon="-43.160"/>
+  <node id="3" lat="-22.950" lon="-43.150"/>
+  <node id="5" lat="-22.960" lon="-43.160"/>
+  <node id="6" lat="-22.960" lon="-43.159"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="residential"/>
+  </way>
+  <way id="12">
+    <nd ref="5"/><nd ref="6"/>
+    <tag k="highway" v="service"/>
+  </way>
+  <relation id="20">
+    <member type="way" ref="10" role=""/>
+    <tag k="type" v="route"/>
+  </relation>
+</osm>
+"""
+
+
+def test_referencia_encaixada_na_maior_componente(tmp_path):
+    caminho = tmp_path / 'rede.osm'
+    caminho.write_text(OSM_COM_FRAGMENTO, encoding='utf-8')
+
+    # O nó mais próximo da referência (5) pertence a um trecho isolado da malha
+    rede = DistanciasRede((-22.9599, -43.1600), str(caminho), str(tmp_path / 'cache'))
+    distancias = rede.distancias([-22.950, -22.960], [-43.150, -43.159])
+
+    assert distancias[0] == pytest.approx(distancia_haversine(-22.95, -43.15, -22.95, -43.16), abs=0.01)
+    # O ponto do trecho isolado é encaixado na maior componente
+    assert distancias[1] == pytest.approx(
+        distancia_haversine(-22.96, -43.159, -22.95, -43.16), abs=0.01)
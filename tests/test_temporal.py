@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from src.formatacao.temporal import periodo_para_indice, remover_alunos_anteriores_2014, classificar_idade, \
+    calcular_tempo_curso, formatar_periodos
+
+
+def test_colunas_de_periodo_inteiras():
+    df = pd.DataFrame({'PERIODO_INGRESSO': ['2014/1°. semestre', '2020/2°. semestre'],
+                       'PERIODO_EVASAO': ['2018/2°. semestre', np.nan]})
+
+    df = formatar_periodos(df)
+
+    assert df['ANO_PERIODO_INGRESSO'].dtype == 'Int16' and df['PERIODO_INGRESSO'].dtype == 'Int16'
+    assert df['ANO_PERIODO_INGRESSO'].tolist() == [2014, 2020]
+    assert df['PERIODO_EVASAO'].tolist() == [2, pd.NA]
+    assert df['INDICE_PERIODO_EVASAO'].tolist() == [4037, pd.NA]
+
+
+def test_semestres_fora_de_1_e_2_ficam_sem_indice():
+    indices = periodo_para_indice(np.array([2014, 2014, 2014, 2014, 2014]), np.array([1, 2, 0, 3, np.nan]))
+
+    assert list(indices[:2]) == [4028, 4029]
+    assert indices[2:].isna().all()
+    assert periodo_para_indice(2014, 3) is pd.NA
+
+
+def test_remocao_anteriores_2014_usa_o_ano():
+    df = pd.DataFrame({'ANO_PERIODO_INGRESSO': [2013.0, 2014.0, 2015.0, np.nan],
+                       'PERIODO_INGRESSO': [1.0, np.nan, 2.0, 1.0]})
+
+    assert remover_alunos_anteriores_2014(df)['ANO_PERIODO_INGRESSO'].tolist() == [2014.0, 2015.0]
+
+
+def test_idade_e_tempo_de_curso_em_semestres_especiais():
+    df = pd.DataFrame({'ANO_PERIODO_INGRESSO': [2014.0, 2014.0], 'PERIODO_INGRESSO': [0.0, 1.0],
+                       'ANO_PERIODO_EVASAO': [2018.0, 2018.0], 'PERIODO_EVASAO': [3.0, 2.0],
+                       'DT_NASCIMENTO': pd.to_datetime(['1995-03-10', '1995-03-10'])})
+
+    df = calcular_tempo_curso(classificar_idade(df))
+
+    # Semestres 0 e 3 começam em julho, como qualquer semestre que não seja o 1º
+    assert df['IDADE_INGRESSO'].tolist() == [19.0, 18.0]
+    assert df['IDADE_EVASAO'].tolist() == [23.0, 23.0]
+    assert df['TEMPO_CURSO'].tolist() == [4.0, 4.5]